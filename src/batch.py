@@ -0,0 +1,151 @@
+"""
+This module runs many point-to-point links headless, using PropagationCalculator, and streams the results to a file.
+
+Each link in the scenario file (CSV with a header row, or JSON Lines) must provide the fields in SCENARIO_FIELDS,
+in the same units as PropagationCalculator (Hz, W, S/m, m). antenna_type and antenna_pol are the indices into
+ANTENNA_GAINS and ANTENNA_POLS. An optional 'id' field is copied to the output.
+
+Results are written in input order, as CSV or JSON Lines depending on the output file extension. If the output
+file already exists, the links it already holds are skipped, so an interrupted run can be resumed.
+
+Functions:
+    read_scenarios(path): Yields one dict per link in the scenario file.
+    evaluate_link(link): Evaluates a single link and returns its RESULT_FIELDS values.
+    count_finished(path): Returns how many complete results an output file holds, dropping a trailing partial line.
+    run_batch(scenario_path, output_path, workers=None, chunksize=BATCH_CHUNKSIZE): Runs every pending link.
+
+Usage:
+    python batch.py scenarios.csv results.csv --workers 8
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from calculations import PropagationCalculator
+
+SCENARIO_FIELDS = ('freq', 'tx_power', 'conductivity', 'permitivity', 'roughness', 'antenna_type', 'antenna_pol',
+                   'earth_radius_factor', 'height_tx', 'height_rx', 'distance')
+RESULT_FIELDS = ('LOS', 'E_total', 'P_r', 'E_fs', 'P_r_fs', 'Gamma', 'F_i')
+OUTPUT_FIELDS = ('index', 'id') + RESULT_FIELDS
+
+BATCH_CHUNKSIZE = 64  # links enviados a cada proceso por tarea
+
+
+def _is_jsonl(path):
+    return os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson')
+
+
+def read_scenarios(path):
+    with open(path, newline='') as file:
+        if _is_jsonl(path):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+
+        for index, row in enumerate(rows):
+            missing = [field for field in SCENARIO_FIELDS if row.get(field) in (None, '')]
+            if missing:
+                raise ValueError(f"Link {index} in {path} is missing {', '.join(missing)}")
+
+            link = {field: float(row[field]) for field in SCENARIO_FIELDS}
+            link['id'] = row.get('id', '')
+            yield link
+
+
+def evaluate_link(link):
+    calculator = PropagationCalculator(link['freq'],
+                                       link['tx_power'],
+                                       link['conductivity'],
+                                       link['permitivity'],
+                                       link['roughness'],
+                                       int(link['antenna_type']),
+                                       int(link['antenna_pol']),
+                                       link['earth_radius_factor'])
+
+    LOS = calculator.calculate_radio_horizon(link['height_tx'], link['height_rx'])
+    results = calculator.calculate_point_to_point(link['height_tx'], link['height_rx'], link['distance'])
+
+    return (float(LOS),) + tuple(float(x) for x in results)
+
+
+def count_finished(path):
+    if not os.path.exists(path):
+        return 0
+
+    # descarta una última línea incompleta, de una corrida interrumpida
+    with open(path, 'rb+') as file:
+        data = file.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            file.truncate(end)
+
+    lines = data[:end].count(b'\n')
+
+    return lines if _is_jsonl(path) else max(lines - 1, 0)
+
+
+def _write_row(file, writer, row):
+    if writer is None:
+        record = dict(zip(OUTPUT_FIELDS, row))
+        for field in RESULT_FIELDS:
+            if math.isnan(record[field]):
+                record[field] = None  # fuera del radiohorizonte
+        file.write(json.dumps(record) + '\n')
+    else:
+        writer.writerow([repr(x) if isinstance(x, float) else x for x in row])
+
+
+def run_batch(scenario_path, output_path, workers=None, chunksize=BATCH_CHUNKSIZE):
+    finished = count_finished(output_path)
+    links = islice(enumerate(read_scenarios(scenario_path)), finished, None)
+    # por el archivo y no por las filas: un archivo con sólo el encabezado también cuenta 0 filas
+    write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+
+    with open(output_path, 'a', newline='') as file:
+        writer = None if _is_jsonl(output_path) else csv.writer(file)
+        if writer is not None and write_header:
+            writer.writerow(OUTPUT_FIELDS)
+
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            # de a bloques, para no encolar todo el archivo de una vez; map conserva el orden de entrada
+            block_size = chunksize * workers * 4
+            while True:
+                block = list(islice(links, block_size))
+                if not block:
+                    break
+
+                scenarios = [link for _, link in block]
+                if executor is None:
+                    results = map(evaluate_link, scenarios)
+                else:
+                    results = executor.map(evaluate_link, scenarios, chunksize=chunksize)
+
+                for (index, link), result in zip(block, results):
+                    _write_row(file, writer, (index, link['id']) + result)
+                file.flush()
+
+                finished += len(block)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    return finished
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate point-to-point links from a scenario file.")
+    parser.add_argument('scenarios', help="scenario file, .csv or .jsonl")
+    parser.add_argument('output', help="results file, .csv or .jsonl; resumed if it already exists")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count, 1 runs inline)")
+    parser.add_argument('--chunksize', type=int, default=BATCH_CHUNKSIZE, help="links per task sent to a worker")
+    args = parser.parse_args()
+
+    total = run_batch(args.scenarios, args.output, workers=args.workers, chunksize=args.chunksize)
+    print(f"{total} links written to {args.output}")
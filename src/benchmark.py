@@ -0,0 +1,259 @@
+"""
+This script benchmarks the propagation kernels and the GUI render path, and compares the results with a saved baseline.
+
+Every case runs on fixed inputs, is timed REPEAT times (best and median kept) and is run once more under tracemalloc
+to record its peak memory. Throughput is reported as points (samples evaluated) per second of the best run; for the
+cases that refine or solve iteratively, points are the geometry samples the calculator actually computes, not the
+length of their result.
+The GUI cases need PyQt6 and run offscreen; they are skipped if it cannot be imported. gui_calculate_* clears
+the window's result cache before every run, gui_calculate_cached_* measures the same run served from it.
+
+Baselines are plain JSON, so they can be kept per machine. With --compare, a case whose best time is more than
+--tolerance slower than in the baseline is flagged as a regression and the script exits with status 1.
+
+Functions:
+    kernel_cases(): Returns the (name, points, function) cases for PropagationCalculator.
+    count_evaluations(calculator, function): Runs function once and returns the geometry samples it computed.
+    gui_cases(): Returns the offscreen MainWindow cases, or [] without PyQt6. Cases that depend on the window's
+        results carry a fourth element, the untimed setup that computes them.
+    measure(name, points, function, repeat=REPEAT, setup=None): Runs setup, then times one case and returns its record.
+    run_benchmarks(only=None, repeat=REPEAT, gui=True): Runs every case and returns the report.
+    compare(report, baseline, tolerance=REGRESSION_TOLERANCE): Returns the names of the regressed cases.
+
+Usage:
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from calculations import PropagationCalculator, draw_samples
+from diagnostics import Diagnostics
+
+REPEAT = 5
+REGRESSION_TOLERANCE = 0.25  # fracción más lenta que la línea de base que se marca como regresión
+
+# enlace de referencia: los valores por defecto de la GUI (radiohorizonte ~36.8 km)
+FREQ = 300e6
+TX_POWER = 1
+CONDUCTIVITY = 0.01
+PERMITIVITY = 9
+ROUGHNESS = 0
+ANTENNA_TYPE = 2
+ANTENNA_POL = 0
+EARTH_RADIUS_FACTOR = 1.33
+HEIGHT_TX = 20
+HEIGHT_RX = 20
+
+DISTANCE_STEPS = (10, 1, 0.1)  # m
+
+
+def _calculator():
+    calculator = PropagationCalculator(FREQ, TX_POWER, CONDUCTIVITY, PERMITIVITY, ROUGHNESS, ANTENNA_TYPE, ANTENNA_POL,
+                                       EARTH_RADIUS_FACTOR)
+    calculator.calculate_calc_los(HEIGHT_TX, HEIGHT_RX)
+    return calculator
+
+
+def count_evaluations(calculator, function):
+    diagnostics = calculator.diagnostics
+    calculator.diagnostics = Diagnostics()
+    try:
+        function()
+        return calculator.diagnostics.counters.get('geometry_samples', 0)
+    finally:
+        calculator.diagnostics = diagnostics
+
+
+def kernel_cases():
+    calculator = _calculator()
+    LOS = calculator.calculate_get_los()
+    cases = []
+
+    def point_to_point_scalar():
+        for distance in range(1000, 11000, 10):
+            calculator.calculate_point_to_point(HEIGHT_TX, HEIGHT_RX, distance)
+    cases.append(('point_to_point_scalar', 1000, point_to_point_scalar))
+
+    distances = np.linspace(1000, LOS, 10**6)
+    cases.append(('point_to_point_vector', len(distances),
+                  lambda: calculator.calculate_point_to_point(HEIGHT_TX, HEIGHT_RX, distances)))
+
+    for step in DISTANCE_STEPS:
+        points = len(calculator.calculate_variation_with_distance(HEIGHT_TX, HEIGHT_RX, 1000, LOS, step))
+        cases.append((f'variation_with_distance_step_{step:g}m', points,
+                      lambda step=step: calculator.calculate_variation_with_distance(HEIGHT_TX, HEIGHT_RX, 1000, LOS, step)))
+
+    # refinan o resuelven iterativamente: se cuentan las muestras evaluadas, no el largo del resultado
+    adaptive = lambda: calculator.calculate_variation_with_distance_adaptive(HEIGHT_TX, HEIGHT_RX, 1000, LOS)
+    cases.append(('variation_with_distance_adaptive', count_evaluations(calculator, adaptive), adaptive))
+
+    extrema = lambda: calculator.calculate_interference_extrema_with_distance(HEIGHT_TX, HEIGHT_RX, 100, LOS)
+    cases.append(('interference_extrema_with_distance', count_evaluations(calculator, extrema), extrema))
+
+    points = len(calculator.calculate_variation_with_height(1, 2000, 0.01, HEIGHT_RX, 10000))
+    cases.append(('variation_with_height', points,
+                  lambda: calculator.calculate_variation_with_height(1, 2000, 0.01, HEIGHT_RX, 10000)))
+
+    # mástiles altos: hasta 2000 m en Tx, a 50 km
+    masts = np.linspace(100, 2000, 10**6)
+    cases.append(('fresnel_zones_tall_masts', len(masts),
+                  lambda: calculator.calculate_fresnel_zones_checker(masts, HEIGHT_RX, 50000)))
+
+    # diseño inverso: 100 enlaces, umbral -90 dBm sobre 50 distancias entre 5 km y el radiohorizonte
+    heights_rx = np.linspace(5, 50, 100)
+    design_distances = np.linspace(5000, 0.99 * LOS, 50)
+    minimum_height = lambda: calculator.calculate_minimum_height(heights_rx, design_distances, 1e-12)
+    cases.append(('minimum_height_100_links', count_evaluations(calculator, minimum_height), minimum_height))
+
+    # Monte Carlo: 10^4 muestras del terreno y de k, 100 distancias
+    samples = draw_samples({'conductivity': ('lognormal', np.log(CONDUCTIVITY), 0.5), 'permitivity': ('uniform', 4, 25),
+                            'roughness': ('uniform', 0, 1), 'earth_radius_factor': ('normal', EARTH_RADIUS_FACTOR, 0.1)},
+                           10**4, seed=0)
+    step = (LOS - 1000) / 100
+    points = len(samples['roughness']) * len(np.arange(1000, LOS + step, step))
+    cases.append(('monte_carlo_1e4_samples', points,
+                  lambda: calculator.calculate_monte_carlo_with_distance(HEIGHT_TX, HEIGHT_RX, 1000, LOS, step, samples)))
+
+    return cases
+
+
+def gui_cases():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt6.QtWidgets import QApplication
+        from gui import MainWindow
+    except ImportError:
+        return []
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = MainWindow()
+    # solo la caché en memoria, que se controla caso por caso; la de $PROPAGATION_CACHE_DIR persistiría entre corridas
+    window.result_cache.disk = None
+    canvases = (window.canvas1, window.canvas2, window.canvas3, window.canvas4)
+    tables = (window.table1, window.table2)
+
+    def calculate(step, cold=True):
+        window.ui.distance_step_input.setText(step)
+        if cold:
+            # sin la caché de resultados, para medir los barridos y no una consulta
+            window.result_cache.clear()
+        window.calculate()
+        while window.worker is not None or window.workers:
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+        for canvas in canvases:
+            canvas.draw()
+
+    def render():
+        for canvas in canvases:
+            canvas.draw()
+
+    def table_fill():
+        for table in tables:
+            model = table.model()
+            model.set_columns(model.headers, model.columns)
+            table.resizeColumnsToContents()
+
+    cases = []
+    for step in ('1', '0.01'):  # km, paso de distancia en la GUI
+        calculate(step)
+        points = sum(table.model().rowCount() for table in tables)
+        cases.append((f'gui_calculate_step_{step}km', points, lambda step=step: calculate(step)))
+        cases.append((f'gui_calculate_cached_step_{step}km', points, lambda step=step: calculate(step, cold=False)))
+        # render y tablas sobre los resultados de su propio paso, calculados fuera de la medición
+        cases.append((f'gui_render_step_{step}km', points, render, lambda step=step: calculate(step)))
+        cases.append((f'gui_table_fill_step_{step}km', points, table_fill, lambda step=step: calculate(step)))
+
+    return cases
+
+
+def measure(name, points, function, repeat=REPEAT, setup=None):
+    if setup is not None:
+        setup()  # sin medir: deja el estado que el caso necesita
+    function()  # calentamiento
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {'name': name, 'points': points, 'best_s': best, 'median_s': statistics.median(times),
+            'points_per_s': points / best if best > 0 else float('inf'), 'peak_mb': peak / 2**20}
+
+
+def run_benchmarks(only=None, repeat=REPEAT, gui=True):
+    results = []
+    for cases in (kernel_cases, gui_cases if gui else list):
+        # los casos de la GUI se arman recién acá, después de los kernels
+        for name, points, function, *setup in cases():
+            if only and only not in name:
+                continue
+            record = measure(name, points, function, repeat, *setup)
+            results.append(record)
+            print(f"{name:40s} {record['points']:>10d} pts  {record['best_s'] * 1e3:10.2f} ms  "
+                  f"{record['points_per_s']:12.4g} pts/s  {record['peak_mb']:8.1f} MB", flush=True)
+
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'processor': platform.processor(), 'cpu_count': os.cpu_count(),
+            'repeat': repeat, 'results': results}
+
+
+def compare(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    base = {record['name']: record for record in baseline['results']}
+    regressions = []
+
+    for record in report['results']:
+        old = base.get(record['name'])
+        if old is None:
+            continue
+        ratio = record['best_s'] / old['best_s']
+        flag = 'REGRESSION' if ratio > 1 + tolerance else ''
+        if flag:
+            regressions.append(record['name'])
+        print(f"{record['name']:40s} {old['best_s'] * 1e3:10.2f} ms -> {record['best_s'] * 1e3:10.2f} ms  x{ratio:5.2f}  {flag}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the propagation kernels and the GUI render path.")
+    parser.add_argument('--save', help="write the report as a JSON baseline")
+    parser.add_argument('--compare', help="baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help="allowed slowdown before flagging, as a fraction")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="timed runs per case")
+    parser.add_argument('--only', help="run only the cases whose name contains this text")
+    parser.add_argument('--no-gui', action='store_true', help="skip the GUI cases")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.only, args.repeat, gui=not args.no_gui)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=1)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
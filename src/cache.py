@@ -0,0 +1,320 @@
+"""
+This module memoizes PropagationCalculator sweeps, so rerunning a sweep whose inputs did not change reuses its result.
+
+Results are keyed on a canonical hash of CODE_VERSION, the calculator's constructor arguments, its radio horizon
+(which bounds the distance sweep), the method name and the sweep arguments, bound to the method's signature with
+defaults applied, so positional, keyword and omitted-default calls share a key. Numbers are hashed by value, so 20
+and 20.0 give the same key, and arrays by dtype, shape and contents. The progress callback and out are not part of
+the key, and calls with out= are never cached. CODE_VERSION combines MODEL_VERSION with a hash of calculations.py, so results
+from another version of the model are never reused.
+
+Cached results are shared, so their arrays are made read-only.
+
+The optional on-disk level stores each result with export.save_result, as <key>.npy + <key>.json, and reads it
+back memory-mapped. Files are written under temporary names and renamed into place, and a result counts as present
+only once its .json exists, so several processes can share a directory. Entries are evicted least recently used
+first (by .json modification time, touched on every hit) once the directory exceeds its size cap.
+
+Classes:
+    ResultCache: Bounded in-memory LRU cache of sweep results, with hit/miss statistics and an optional disk level.
+    DiskResultCache: Size-bounded on-disk LRU store of sweep results, shareable between processes.
+
+ResultCache:
+    Methods:
+        __init__(self, max_entries=RESULT_CACHE_SIZE, max_bytes=RESULT_CACHE_BYTES, disk=None): Creates an empty
+            cache, backed by a DiskResultCache if given.
+        call(self, calculator, method, *args, progress=None, **kwargs): Returns calculator.method(*args, **kwargs),
+            from the cache when possible.
+        stats(self): Returns hits, misses, hit rate, entries and bytes held (and the disk level's stats).
+        clear(self): Drops every in-memory entry and resets the statistics.
+
+DiskResultCache:
+    Methods:
+        __init__(self, directory, max_bytes=DISK_CACHE_BYTES): Uses (and creates) the given directory.
+        get(self, key): Returns the stored result, memory-mapped, or None.
+        put(self, key, result, metadata=None): Stores a result and evicts old entries over the size cap.
+        stats(self): Returns hits, misses, entries and bytes on disk.
+        clear(self): Deletes every entry in the directory.
+
+Functions:
+    canonical_key(*values): Hex digest identifying the given numbers, strings, tuples, dicts and arrays.
+    calculator_key(calculator, method, args, kwargs): canonical_key of a calculator method call.
+"""
+
+import hashlib
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+import calculations
+from calculations import CoverageGridResult
+from export import load_result, save_result
+
+RESULT_CACHE_SIZE = 32  # resultados guardados, como máximo
+RESULT_CACHE_BYTES = 256 * 2**20  # y bytes de arrays guardados, como máximo
+DISK_CACHE_BYTES = 2 * 2**30  # tamaño máximo del directorio de la caché en disco
+DISK_CACHE_ENV = 'PROPAGATION_CACHE_DIR'  # si está definida, la GUI y la CLI usan ese directorio como caché en disco
+DISK_CACHE_STALE_TEMP = 3600  # s; temporales más viejos quedaron de un proceso interrumpido y se borran
+
+
+def _code_version():
+    # sin el fuente (p.ej. empaquetado con PyInstaller) queda solo MODEL_VERSION
+    try:
+        with open(calculations.__file__, 'rb') as file:
+            return f"{calculations.MODEL_VERSION}-{hashlib.sha256(file.read()).hexdigest()[:16]}"
+    except (OSError, TypeError):
+        return f"{calculations.MODEL_VERSION}"
+
+
+CODE_VERSION = _code_version()
+
+KEY_EXCLUDED_ARGUMENTS = ('progress', 'out')  # no cambian el resultado
+
+CALCULATOR_PARAMETERS = ('freq', 'tx_power', 'sigma', 'epsilon_r', 'roughness', 'antenna', 'antenna_pol',
+                         'earth_radius_factor', 'LOS_point_to_point')
+
+
+def _canonical(value, digest):
+    if value is None or isinstance(value, (bool, np.bool_)):
+        digest.update(repr(value).encode())
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        # por valor: 20 y 20.0 son la misma entrada
+        digest.update(b'f' + float(value).hex().encode())
+    elif isinstance(value, str):
+        digest.update(b's' + repr(value).encode())
+    elif isinstance(value, (tuple, list)):
+        digest.update(b'(')
+        for item in value:
+            _canonical(item, digest)
+            digest.update(b',')
+        digest.update(b')')
+    elif isinstance(value, dict):
+        # p.ej. las muestras de Monte Carlo; sin depender del orden de inserción
+        digest.update(b'{')
+        for name in sorted(value):
+            _canonical(name, digest)
+            digest.update(b':')
+            _canonical(value[name], digest)
+            digest.update(b',')
+        digest.update(b'}')
+    elif isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        digest.update(b'a' + repr((value.dtype.str, value.shape)).encode())
+        digest.update(value.tobytes())
+    else:
+        raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+def canonical_key(*values):
+    digest = hashlib.sha256()
+    _canonical(values, digest)
+    return digest.hexdigest()
+
+
+def calculator_key(calculator, method, args, kwargs):
+    parameters = tuple(getattr(calculator, name) for name in CALCULATOR_PARAMETERS)
+    # argumentos por nombre y con los valores por defecto: f(a, True) y f(a, vary_tx=True) son la misma entrada
+    bound = inspect.signature(getattr(calculator, method)).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: value for name, value in bound.arguments.items() if name not in KEY_EXCLUDED_ARGUMENTS}
+    return canonical_key(CODE_VERSION, parameters, method, arguments)
+
+
+def _arrays(result):
+    if isinstance(result, CoverageGridResult):
+        return (result.distances, result.heights, result.data)
+    return (result.data,)
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of sweep results. Safe to share between the GUI thread and worker threads.
+    """
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, max_bytes=RESULT_CACHE_BYTES, disk=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.entries = OrderedDict()  # clave -> (resultado, bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def call(self, calculator, method, *args, progress=None, **kwargs):
+        if kwargs.get('out') is not None:
+            # el llamador es dueño del archivo de salida, no se cachea
+            return getattr(calculator, method)(*args, progress=progress, **kwargs)
+
+        key = calculator_key(calculator, method, args, kwargs)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None and self.disk is not None:
+            result = self.disk.get(key)
+            if result is not None:
+                calculator.diagnostics.count('disk_cache_hits')
+                self._store(key, result)
+                entry = (result, 0)
+
+        if entry is not None:
+            calculator.diagnostics.count('result_cache_hits')
+            result = entry[0]
+            # mismo efecto que la corrida original sobre la calculadora
+            if method.startswith('calculate_variation_with_distance') and len(result):
+                calculator.max_distance = result.distances[-1]
+            if progress is not None:
+                progress(len(result), len(result))
+            return result
+
+        calculator.diagnostics.count('result_cache_misses')
+        if progress is not None:
+            kwargs['progress'] = progress
+        result = getattr(calculator, method)(*args, **kwargs)
+
+        if self.disk is not None:
+            self.disk.put(key, result, {'method': method, 'code_version': CODE_VERSION})
+
+        self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        arrays = _arrays(result)
+        # lo memory-mapped desde la caché en disco no ocupa memoria propia
+        size = sum(array.nbytes for array in arrays if not isinstance(array, np.memmap))
+        if size > self.max_bytes:
+            return
+        for array in arrays:
+            array.flags.writeable = False
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = (result, size)
+                self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def stats(self):
+        with self.lock:
+            calls = self.hits + self.misses
+            stats = {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / calls if calls else 0.0,
+                     'entries': len(self.entries), 'bytes': self.bytes}
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+class DiskResultCache:
+    """
+    Size-bounded on-disk LRU store of sweep results, one .npy + .json pair per key.
+    Every filesystem race with another process (a file evicted or replaced meanwhile) is treated as a miss.
+    """
+    def __init__(self, directory, max_bytes=DISK_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _stem(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        stem = self._stem(key)
+        try:
+            result, _ = load_result(stem + '.npy')
+            os.utime(stem + '.json')  # LRU: último uso
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return result
+
+    def put(self, key, result, metadata=None):
+        stem = self._stem(key)
+        temp = f"{stem}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            save_result(temp + '.npy', result, metadata)
+            # el .json al final: recién ahí la entrada cuenta como presente
+            os.replace(temp + '.npy', stem + '.npy')
+            os.replace(temp + '.json', stem + '.json')
+        except OSError:
+            # p.ej. en Windows, si otro proceso tiene mapeado el .npy; la entrada ya está o se guardará después
+            for path in (temp + '.npy', temp + '.json'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return
+
+        self.evict()
+
+    def _entries(self):
+        # (último uso, bytes, stem) de cada entrada completa
+        entries = []
+        for item in os.scandir(self.directory):
+            if not item.name.endswith('.json') or item.name.endswith('.tmp.json'):
+                continue
+            stem = item.path[:-len('.json')]
+            try:
+                size = item.stat().st_size + os.stat(stem + '.npy').st_size
+                entries.append((item.stat().st_mtime, size, stem))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        # restos de escrituras interrumpidas
+        now = time.time()
+        for item in os.scandir(self.directory):
+            if '.tmp.' in item.name:
+                try:
+                    if now - item.stat().st_mtime > DISK_CACHE_STALE_TEMP:
+                        os.remove(item.path)
+                except OSError:
+                    pass
+
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, stem in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # primero el .json, para que nadie lea un .npy a medio borrar
+            for path in (stem + '.json', stem + '.npy'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def stats(self):
+        entries = self._entries()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries)}
+
+    def clear(self):
+        for item in os.scandir(self.directory):
+            if item.name.endswith(('.npy', '.json')):
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    pass
@@ -4,6 +4,14 @@ for VHF and UHF signals, including point-to-point propagation, line-of-sight (LO
 and variation with height.
     
 Classes:
+    ReflectionGeometry: Frequency-independent reflection geometry shared by the field and Fresnel computations.
+    SweepResult: Base class for array-backed sweep results.
+    DistanceSweepResult: Array-backed result of calculate_variation_with_distance.
+    HeightSweepResult: Array-backed result of calculate_variation_with_height.
+    InterferenceExtremaResult: Array-backed lobes and nulls found by calculate_interference_extrema_with_*.
+    InverseDesignResult: Array-backed per-link result of calculate_minimum_height and calculate_minimum_tx_power.
+    MonteCarloResult: Array-backed percentile curves of calculate_monte_carlo_with_distance.
+    CoverageGridResult: Array-backed result of calculate_coverage_grid.
     PropagationCalculator: A class to calculate various propagation characteristics for VHF and UHF signals.
     
 Methods:
@@ -11,23 +19,73 @@ Methods:
         Initializes the PropagationCalculator with the given parameters.
     calculate_point_to_point(self, height_tx, height_rx, distance):
         Calculates the point-to-point propagation characteristics between a transmitter and receiver.
+    calculate_reflection_geometry(self, height_tx, height_rx, distance):
+        Solves the reflection point once and returns a ReflectionGeometry.
+    calculate_reflection(self, geometry, freq=None):
+        Returns the path phase difference Delta and the complex reflection coefficient on a ReflectionGeometry.
+    calculate_field(self, geometry, freq=None):
+        Evaluates field, power, |Gamma| and |F_i| on a ReflectionGeometry, NaN beyond the radio horizon.
+    calculate_variation_with_frequency(self, freqs, height_tx, height_rx, distance):
+        Evaluates calculate_point_to_point over an array of frequencies, computing the reflection geometry once.
+    calculate_radio_horizon(self, height_tx, height_rx):
+        Returns the radio horizon distance for the given heights, without storing it. Accepts arrays.
     calculate_calc_los(self, height_tx, height_rx):
         Calculates the line-of-sight (LOS) distance between a transmitter and receiver.
     calculate_get_los(self):
         Returns the calculated LOS distance.
-    calculate_variation_with_distance(self, height_tx, height_rx, distance_start, distance_end, distance_step):
-        Calculates the variation of propagation characteristics with distance.
+    calculate_variation_with_distance(self, height_tx, height_rx, distance_start, distance_end, distance_step,
+                                      chunk_size=SWEEP_CHUNK_SIZE, progress=None, out=None):
+        Calculates the variation of propagation characteristics with distance. Returns a DistanceSweepResult.
+    calculate_variation_with_distance_adaptive(self, height_tx, height_rx, distance_start, distance_end,
+                                               phase_tolerance=ADAPTIVE_PHASE_TOLERANCE, db_tolerance=ADAPTIVE_DB_TOLERANCE,
+                                               min_step=ADAPTIVE_MIN_STEP, initial_points=ADAPTIVE_INITIAL_POINTS,
+                                               max_points=ADAPTIVE_MAX_POINTS):
+        Same as calculate_variation_with_distance on adaptive distances, denser around the nulls.
+    calculate_interference_extrema_with_distance(self, height_tx, height_rx, distance_start, distance_end,
+                                                 tolerance=LOBE_TOLERANCE):
+        Locates the lobes and nulls of F_i versus distance. Returns an InterferenceExtremaResult.
+    calculate_interference_extrema_with_height(self, height_start, height_end, height_fixed, distance, vary_tx=True,
+                                               tolerance=LOBE_TOLERANCE):
+        Same, versus the height of one antenna at the given distance.
     calculate_fresnel_zones_checker(self, ht, hr, distance):
-        Checks the Fresnel zones for the given transmitter and receiver heights and distance.
-    calculate_variation_with_height(self, height_start, height_end, height_step, height_fixed, vary_tx=True):
-        Calculates the variation of propagation characteristics with height.
+        Returns the number of cleared Fresnel zones and the clearance hp / first-zone radius.
+    calculate_fresnel_clearance(self, geometry):
+        Same as calculate_fresnel_zones_checker, on an already computed ReflectionGeometry.
+    calculate_variation_with_height(self, height_start, height_end, height_step, height_fixed, distance, vary_tx=True,
+                                    chunk_size=SWEEP_CHUNK_SIZE, progress=None):
+        Calculates the variation of propagation characteristics with height. Returns a HeightSweepResult.
+    calculate_coverage_grid(self, distance_start, distance_end, distance_step, height_start, height_end, height_step,
+                            height_fixed, vary_tx=True, chunk_size=GRID_CHUNK_SIZE, out=None):
+        Evaluates field, power and Fresnel clearance over a distance x height mesh. Returns a CoverageGridResult.
+    calculate_minimum_height(self, height_fixed, distances, p_r_min, vary_tx=True, min_clearance=DESIGN_MIN_CLEARANCE,
+                             height_max=DESIGN_HEIGHT_MAX, tolerance=DESIGN_HEIGHT_TOLERANCE):
+        Finds the lowest antenna height keeping P_r >= p_r_min (W), for many links at once.
+    calculate_minimum_tx_power(self, height_tx, height_rx, distances, p_r_min, min_clearance=DESIGN_MIN_CLEARANCE):
+        Same, for the minimum Tx power.
+    calculate_monte_carlo_with_distance(self, height_tx, height_rx, distance_start, distance_end, distance_step, samples,
+                                        chunk_size=MONTE_CARLO_CHUNK_SIZE, progress=None):
+        Evaluates the distance sweep over Monte Carlo samples of the ground and k-factor. Returns a MonteCarloResult.
     plot_results(self, x_values, y_values, x_label, y_label, title):
         Plots the results of the calculations.
+
+Functions:
+    draw_samples(distributions, n, seed=None):
+        Draws n samples per uncertain parameter for calculate_monte_carlo_with_distance.
+
+The diagnostics attribute holds a disabled Diagnostics; assigning an enabled one records the time spent in
+the geometry, field, Fresnel, LOS and sweep stages, and counts the samples evaluated, the geometry samples computed
+(including the refinement steps of the adaptive sweep, the extrema locators and the inverse solvers) and the samples
+masked beyond the horizon.
 """
 
+import copy
+import mmap
+
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import fsolve
+
+from diagnostics import Diagnostics, timed
+
+# matplotlib solo se importa en plot_results, para que el uso sin GUI dependa únicamente de NumPy
 
 C = 299792458.0  # velocidad de la luz en m/s
 EPSILON_ZERO = 8.854187817e-12  # permitividad del vacío en F/m
@@ -47,6 +105,257 @@ ANTENNA_POLS = [ANTENNA_POL_H, ANTENNA_POL_V]
 
 EARTH_RADIUS = 6371e3  # radio de la tierra en m
 
+SWEEP_CHUNK_SIZE = 2**16  # puntos evaluados por bloque en los barridos en distancia y altura
+GRID_CHUNK_SIZE = 2**16  # celdas evaluadas por bloque en la grilla distancia x altura
+
+# muestreo adaptivo en distancia
+ADAPTIVE_INITIAL_POINTS = 256  # grilla uniforme inicial
+ADAPTIVE_PHASE_TOLERANCE = np.pi / 8  # máximo cambio de fase de interferencia (Delta + arg Gamma) por intervalo, rad
+ADAPTIVE_DB_TOLERANCE = 0.5  # máximo error de interpolación lineal de F_i en el punto medio, dB
+ADAPTIVE_MIN_STEP = 0.1  # intervalo mínimo, m
+ADAPTIVE_MAX_POINTS = 2**20  # tope de evaluaciones
+ADAPTIVE_F_I_FLOOR = 1e-6  # piso de |F_i| para pasar a dB en los nulos (-120 dB)
+
+# lóbulos y nulos de interferencia
+LOBE_TOLERANCE = 1e-3  # m, ancho final del intervalo de bisección de cada lóbulo o nulo
+LOBE_BRACKET_PHASE = np.pi / 4  # máximo cambio de fase de interferencia entre puntos de la grilla de brackets
+LOBE_MIN_POINTS = 64  # puntos mínimos de la grilla de brackets
+LOBE_MAX_ITERATIONS = 64  # iteraciones máximas de bisección
+
+# diseño inverso: altura o potencia mínima para un umbral de potencia recibida
+DESIGN_MIN_CLEARANCE = 0.6  # despeje mínimo hp / radio de la 1ra zona de Fresnel
+DESIGN_HEIGHT_MAX = 1000  # m, altura máxima buscada
+DESIGN_HEIGHT_TOLERANCE = 0.01  # m
+DESIGN_SCAN_PER_LOBE = 32  # pasos del escaneo inicial por período de lóbulo en altura
+DESIGN_MIN_SCAN_STEPS = 64  # pasos mínimos del escaneo inicial entre la altura mínima y la máxima
+
+# Monte Carlo sobre parámetros inciertos del terreno y la atmósfera
+MONTE_CARLO_CHUNK_SIZE = 2**20  # celdas distancia x muestra evaluadas por bloque
+MONTE_CARLO_PERCENTILES = (10, 50, 90)
+MONTE_CARLO_PARAMETERS = {  # parámetro del constructor -> (atributo, mínimo físico, o None si debe ser > 0)
+    'conductivity': ('sigma', 0),
+    'permitivity': ('epsilon_r', 1),
+    'roughness': ('roughness', 0),
+    'earth_radius_factor': ('earth_radius_factor', None),  # k <= 0 no tiene radiohorizonte: se rechaza, no se recorta
+}
+
+MODEL_VERSION = 1  # incrementar cuando un cambio del modelo altera los resultados (invalida la caché en disco)
+
+class ReflectionGeometry:
+    """
+    Reflection-point geometry over the spherical earth for the given heights, distance and effective radius re.
+    Depends only on (ht, hr, r, k), not on frequency, ground constants or polarization, so it can feed
+    calculate_field and calculate_fresnel_clearance alike. Arrays broadcast together.
+    """
+    __slots__ = ('ht', 'hr', 'r', 're', 'r1', 'r2', 'Rd', 'Delta_R', 'Psi', 'beyond_horizon')
+
+    def __init__(self, ht, hr, r, re, r1, r2, Rd, Delta_R, Psi, beyond_horizon):
+        self.ht = ht
+        self.hr = hr
+        self.r = r
+        self.re = re
+        self.r1 = r1
+        self.r2 = r2
+        self.Rd = Rd
+        self.Delta_R = Delta_R
+        self.Psi = Psi
+        self.beyond_horizon = beyond_horizon
+
+
+def _column(i):
+    return property(lambda self: self.data[i])
+
+
+class SweepResult:
+    """
+    Result of a sweep, stored as one contiguous float64 block with one row per name in COLUMNS.
+    Unpacks in the same order as COLUMNS. data may be given (e.g. a memory-mapped array) instead of allocated.
+    """
+    __slots__ = ('data',)
+    COLUMNS = ()
+
+    def __init__(self, n, data=None):
+        if data is None:
+            data = np.empty((len(self.COLUMNS), n), dtype=np.float64)
+        elif data.shape != (len(self.COLUMNS), n):
+            raise ValueError(f"{type(self).__name__} data must have shape {(len(self.COLUMNS), n)}, not {data.shape}")
+        self.data = data
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    def __iter__(self):
+        return iter(self.data)
+
+
+class DistanceSweepResult(SweepResult):
+    __slots__ = ()
+    COLUMNS = ('distances', 'E_total', 'P_r', 'E_fs', 'P_r_fs', 'Gamma', 'F_i')
+
+    distances = _column(0)
+    E_total = _column(1)
+    P_r = _column(2)
+    E_fs = _column(3)
+    P_r_fs = _column(4)
+    Gamma = _column(5)
+    F_i = _column(6)
+
+
+class HeightSweepResult(SweepResult):
+    __slots__ = ()
+    COLUMNS = ('heights', 'E_total', 'P_r', 'Gamma', 'F_i', 'fresnel_zones', 'fresnel_clearance')
+
+    heights = _column(0)
+    E_total = _column(1)
+    P_r = _column(2)
+    Gamma = _column(3)
+    F_i = _column(4)
+    fresnel_zones = _column(5)
+    fresnel_clearance = _column(6)
+
+
+class InterferenceExtremaResult(SweepResult):
+    """
+    Lobes (F_i maxima) and nulls (F_i minima) of the two-ray interference pattern, at the positions (distances
+    or heights, increasing) where Delta + arg(Gamma) = order * pi. Even orders are lobes, odd orders are nulls.
+    """
+    __slots__ = ()
+    COLUMNS = ('positions', 'order', 'E_total', 'P_r', 'F_i')
+
+    positions = _column(0)
+    order = _column(1)
+    E_total = _column(2)
+    P_r = _column(3)
+    F_i = _column(4)
+
+    @property
+    def nulls(self):
+        return self.order % 2 == 1
+
+
+class InverseDesignResult(SweepResult):
+    """
+    Result of calculate_minimum_height and calculate_minimum_tx_power, one column per link. value is the solved
+    height (m) or Tx power (W), NaN where no value meets the requirements; P_r and fresnel_clearance are the
+    worst cases over the link's distances at that value.
+    """
+    __slots__ = ()
+    COLUMNS = ('value', 'P_r', 'fresnel_clearance')
+
+    value = _column(0)
+    P_r = _column(1)
+    fresnel_clearance = _column(2)
+
+
+class MonteCarloResult(SweepResult):
+    """
+    Percentiles across Monte Carlo samples of P_r and E_total at each distance, plus the fraction of samples
+    beyond their radio horizon, which count as zero field and power.
+    """
+    __slots__ = ()
+    COLUMNS = ('distances', 'P_r_p10', 'P_r_p50', 'P_r_p90', 'E_total_p10', 'E_total_p50', 'E_total_p90', 'beyond_horizon')
+
+    distances = _column(0)
+    P_r_p10 = _column(1)
+    P_r_p50 = _column(2)
+    P_r_p90 = _column(3)
+    E_total_p10 = _column(4)
+    E_total_p50 = _column(5)
+    E_total_p90 = _column(6)
+    beyond_horizon = _column(7)
+
+
+class CoverageGridResult:
+    """
+    Result of a distance x height grid. Each layer in LAYERS is a (len(heights), len(distances)) float64 array,
+    NaN beyond the radio horizon. Cleared Fresnel zones per cell are floor(fresnel_clearance**2) where positive.
+    data may be given (e.g. a memory-mapped array) instead of allocated.
+    """
+    __slots__ = ('distances', 'heights', 'data')
+    LAYERS = ('E_total', 'P_r', 'fresnel_clearance')
+
+    def __init__(self, distances, heights, data=None):
+        shape = (len(self.LAYERS), len(heights), len(distances))
+        if data is None:
+            data = np.empty(shape, dtype=np.float64)
+        elif data.shape != shape:
+            raise ValueError(f"CoverageGridResult data must have shape {shape}, not {data.shape}")
+        self.distances = distances
+        self.heights = heights
+        self.data = data
+
+    E_total = _column(0)
+    P_r = _column(1)
+    fresnel_clearance = _column(2)
+
+
+def draw_samples(distributions, n, seed=None):
+    # distribución: número (constante), ('normal', media, desvío), ('uniform', mínimo, máximo)
+    # o ('lognormal', media, sigma) del logaritmo; se recortan al rango físico de MONTE_CARLO_PARAMETERS
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name, distribution in distributions.items():
+        if name not in MONTE_CARLO_PARAMETERS:
+            raise ValueError(f"Unknown Monte Carlo parameter {name}, expected one of {', '.join(MONTE_CARLO_PARAMETERS)}")
+        if np.isscalar(distribution):
+            values = np.full(n, float(distribution))
+        else:
+            kind, *parameters = distribution
+            if kind not in ('normal', 'uniform', 'lognormal'):
+                raise ValueError(f"Unknown distribution {kind} for {name}")
+            values = getattr(rng, kind)(*parameters, size=n)
+        # recortadas al rango físico
+        minimum = MONTE_CARLO_PARAMETERS[name][1]
+        samples[name] = values if minimum is None else np.maximum(values, minimum)
+    _check_samples(samples)
+    return samples
+
+
+def _check_samples(samples):
+    for name, (_, minimum) in MONTE_CARLO_PARAMETERS.items():
+        if minimum is None and name in samples and np.any(np.asarray(samples[name]) <= 0):
+            raise ValueError(f"Monte Carlo samples of {name} must be positive")
+
+
+def _arange_length(start, stop, step):
+    # mismo largo que np.arange(start, stop, step)
+    return max(int(np.ceil((stop - start) / step)), 0)
+
+
+def _arange_block(start, step, i_start, i_end):
+    # elementos [i_start, i_end) de np.arange(start, ..., step), sin materializar el resto; NumPy llena
+    # el arange como start + i*delta, con delta = (start + step) - start y el segundo elemento exacto
+    values = start + np.arange(i_start, i_end) * ((start + step) - start)
+    if i_start <= 1 < i_end:
+        values[1 - i_start] = start + step
+    return values
+
+
+def _wrap_phase(phase):
+    # a [-pi, pi)
+    return (phase + np.pi) % (2 * np.pi) - np.pi
+
+
+def _release_pages(data):
+    # con salida memory-mapped: escribe al archivo lo calculado y suelta esas páginas, para que la memoria
+    # residente quede acotada por el bloque y no crezca con el total del barrido
+    if isinstance(data, np.memmap):
+        data.flush()
+        if isinstance(data.base, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+            data.base.madvise(mmap.MADV_DONTNEED)
+
+
+def _output_array(out, shape):
+    # out: None (en memoria), una ruta .npy a crear memory-mapped, o un array ya creado por el llamador
+    if out is None:
+        return np.empty(shape, dtype=np.float64)
+    if isinstance(out, str):
+        return np.lib.format.open_memmap(out, mode='w+', dtype=np.float64, shape=shape)
+    if out.shape != shape:
+        raise ValueError(f"out must have shape {shape}, not {out.shape}")
+    return out
+
+
 class PropagationCalculator:
     def __init__(self, freq, tx_power, conductivity, permitivity, roughness, antenna_type, antenna_pol, earth_radius_factor):
         self.freq = freq
@@ -64,69 +373,119 @@ class PropagationCalculator:
         self.antenna_pol = antenna_pol
         self.LOS_point_to_point = None
         self.max_distance = None
+        self.diagnostics = Diagnostics(enabled=False)  # se reemplaza por uno habilitado para medir etapas
 
     def calculate_point_to_point(self, height_tx, height_rx, distance):
+        # alturas y distancia pueden ser arrays, que se broadcastean; fuera del radiohorizonte da NaN
+        geometry = self.calculate_reflection_geometry(height_tx, height_rx, distance)
         
-        re = self.earth_radius_factor * EARTH_RADIUS
-        r = distance  # distancia entre Tx y Rx, sobre la superficie
-        ht = height_tx
-        hr = height_rx
+        return self.calculate_field(geometry)
 
-        if r >= self.LOS_point_to_point:
-            return None, None, None, None, None, None, None
-        
-        # if r < self.LOS_point_to_point:
-        
-        p = (2 / np.sqrt(3)) * np.sqrt(re * (hr + ht) + r*r/4)
+    def calculate_variation_with_frequency(self, freqs, height_tx, height_rx, distance):
+        # la geometría de reflexión no depende de la frecuencia
+        geometry = self.calculate_reflection_geometry(height_tx, height_rx, distance)
         
-        Xi = np.arcsin(2 * re * r * (hr - ht) / (p*p*p))
+        # eje de frecuencias adelante, seguido del shape broadcasteado de las alturas y la distancia
+        freqs = np.asarray(freqs, dtype=np.float64)
+        freqs = freqs.reshape(freqs.shape + (1,) * np.ndim(geometry.Rd))
         
-        r1 = r/2 - p * np.sin(Xi/3)
-        r2 = r - r1
+        return self.calculate_field(geometry, freqs)
+
+    @timed('reflection_geometry')
+    def calculate_reflection_geometry(self, height_tx, height_rx, distance):
+        r = np.asarray(distance, dtype=np.float64)  # distancia entre Tx y Rx, sobre la superficie
+        ht = np.asarray(height_tx, dtype=np.float64)
+        hr = np.asarray(height_rx, dtype=np.float64)
         
-        phi1 = r1/re
-        phi2 = r2/re
+        re = self.earth_radius_factor * EARTH_RADIUS
         
-        self.ht_eff = ht - 0.5 * re * phi1**2
-        self.hr_eff = hr - 0.5 * re * phi2**2
+        # puntos fuera del radiohorizonte, se enmascaran con NaN
+        beyond_horizon = r >= self.calculate_radio_horizon(ht, hr)
         
-        R1 = np.sqrt(ht**2 + 4 * re * (re + ht) * (np.sin(phi1 / 2)**2))
-        R2 = np.sqrt(hr**2 + 4 * re * (re + hr) * (np.sin(phi2 / 2)**2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            p = (2 / np.sqrt(3)) * np.sqrt(re * (hr + ht) + r*r/4)
+            
+            Xi = np.arcsin(2 * re * r * (hr - ht) / (p*p*p))
+            
+            r1 = r/2 - p * np.sin(Xi/3)
+            r2 = r - r1
+            
+            phi1 = r1/re
+            phi2 = r2/re
+            
+            R1 = np.sqrt(ht**2 + 4 * re * (re + ht) * (np.sin(phi1 / 2)**2))
+            R2 = np.sqrt(hr**2 + 4 * re * (re + hr) * (np.sin(phi2 / 2)**2))
+            
+            Rd = np.sqrt((hr - ht)**2 + 4 * (re + hr) * (re + ht) * (np.sin((phi1 + phi2) / 2)**2)) # distancia entre Tx y Rx, real
+            
+            
+            Delta_R = R1 + R2 - Rd
+            
+            sqrt_arg = Delta_R * (R1 + R2 + Rd) / (4 * R1 * R2)
+            arcsin_arg = np.sqrt(sqrt_arg) 
+            Psi = np.arcsin(arcsin_arg)
+            # Psi = np.arcsin(ht_eff / R1)
+            
+            # fmax descarta NaN, igual que el "Psi if Psi > lim_psi else lim_psi" escalar
+            lim_psi = np.deg2rad(0.1)
+            Psi = np.fmax(Psi, lim_psi)
+
+        geometry = ReflectionGeometry(ht, hr, r, re, r1, r2, Rd, Delta_R, Psi, beyond_horizon)
+        self.diagnostics.count('geometry_samples', np.size(Rd))
         
-        Rd = np.sqrt((hr - ht)**2 + 4 * (re + hr) * (re + ht) * (np.sin((phi1 + phi2) / 2)**2)) # distancia entre Tx y Rx, real
+        return geometry
+
+    def calculate_reflection(self, geometry, freq=None):
+        if freq is None:
+            freq = self.freq
         
+        re = geometry.re
+        r, r1, r2, Delta_R, Psi = geometry.r, geometry.r1, geometry.r2, geometry.Delta_R, geometry.Psi
         
-        Delta_R = R1 + R2 - Rd
+        w = 2 * np.pi * freq
+        Beta = w / C
         
-        sqrt_arg = Delta_R * (R1 + R2 + Rd) / (4 * R1 * R2)
-        arcsin_arg = np .sqrt(sqrt_arg) 
-        Psi = np.arcsin(arcsin_arg)
-        # Psi = np.arcsin(ht_eff / R1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            Delta = Beta * Delta_R                                     # diferencia de camino óptico
         
-        lim_psi = np.deg2rad(0.1)
-        Psi = Psi if Psi > lim_psi else lim_psi
 
-        Delta = self.Beta * Delta_R                                     # diferencia de camino óptico
-    
-
-        epsilon_c = self.epsilon_r - 1j * self.sigma / (self.w * EPSILON_ZERO)
-        
-        # Coeficientes de reflexión
-        if self.antenna_pol == ANTENNA_POL_H:
-            Gamma = (epsilon_c * np.sin(Psi) - np.sqrt(epsilon_c - np.cos(Psi)**2)) / (epsilon_c * np.sin(Psi) + np.sqrt(epsilon_c - np.cos(Psi)**2))
-        elif self.antenna_pol == ANTENNA_POL_V:
-            Gamma = (np.sin(Psi) - np.sqrt(epsilon_c - np.cos(Psi)**2)) / (np.sin(Psi) + np.sqrt(epsilon_c - np.cos(Psi)**2))
+            epsilon_c = self.epsilon_r - 1j * self.sigma / (w * EPSILON_ZERO)
+            
+            sin_Psi = np.sin(Psi)
+            sqrt_term = np.sqrt(epsilon_c - np.cos(Psi)**2)
+            
+            # Coeficientes de reflexión
+            if self.antenna_pol == ANTENNA_POL_H:
+                Gamma = (epsilon_c * sin_Psi - sqrt_term) / (epsilon_c * sin_Psi + sqrt_term)
+            elif self.antenna_pol == ANTENNA_POL_V:
+                Gamma = (sin_Psi - sqrt_term) / (sin_Psi + sqrt_term)
+            
+            # Factor de divergencia por superficie curva
+            D_factor = 1 / np.sqrt(1 + (2 * r1 * r2) / (re * r * sin_Psi))
+            
+            # Rugosidad
+            roughness_factor = np.exp(-2 * (Beta * self.roughness * sin_Psi)**2)
+            
+            # Gamma efectivo, con los factores de divergencia y rugosidad
+            Gamma = Gamma * D_factor * roughness_factor
         
-        # Factor de divergencia por superficie curva
-        D_factor = 1 / np.sqrt(1 + (2 * r1 * r2) / (re * r * np.sin(Psi)))
+        return Delta, Gamma
+
+    @timed('field')
+    def calculate_field(self, geometry, freq=None):
+        if freq is None:
+            freq = self.freq
         
-        # Rugosidad
-        roughness_factor = np.exp(-2 * (self.Beta * self.roughness * np.sin(Psi))**2)
+        Rd = geometry.Rd
         
-        Gamma = Gamma * D_factor * roughness_factor
+        lambd = C / freq
         
-        # Factor de interferencia
-        F_i = np.sqrt(1 + np.abs(Gamma)**2 + 2 * np.abs(Gamma) * np.cos(Delta + np.angle(Gamma)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            Delta, Gamma = self.calculate_reflection(geometry, freq)
+            Gamma_abs = np.abs(Gamma)
+            
+            # Factor de interferencia
+            F_i = np.sqrt(1 + Gamma_abs**2 + 2 * Gamma_abs * np.cos(Delta + np.angle(Gamma)))
         
         
         
@@ -146,9 +505,9 @@ class PropagationCalculator:
         P_t = self.tx_power * self.antenna_tx_gain  # potencia de transmisión
         E_zero = np.sqrt(ETA_ZERO * P_t / (4 * np.pi)) / Rd
 
-        E_total = np.abs(E_zero) * np.abs(F_i)
-        P_r =   (np.abs(E_total)**2 / ETA_ZERO) * \
-                    (self.lambd**2 / (4 * np.pi)) * \
+        E_total = np.abs(E_zero) * F_i
+        P_r =   (E_total**2 / ETA_ZERO) * \
+                    (lambd**2 / (4 * np.pi)) * \
                     self.antenna_rx_gain       
                 
         # if Psi > lim_psi:
@@ -169,9 +528,9 @@ class PropagationCalculator:
         #     E_total = np.sqrt(ETA_ZERO * P_r / ((self.lambd**2 / (4 * np.pi)) * self.antenna_rx_gain))
         
         # Pérdida por espacio libre
-        L_fs = (4 * np.pi * Rd / self.lambd) ** 2
+        L_fs = (4 * np.pi * Rd / lambd) ** 2
         P_r_fs = (P_t / L_fs) * self.antenna_rx_gain
-        E_fs = np.sqrt(ETA_ZERO * (P_r_fs / ((self.lambd**2 / (4 * np.pi)) * self.antenna_rx_gain)))
+        E_fs = np.sqrt(ETA_ZERO * (P_r_fs / ((lambd**2 / (4 * np.pi)) * self.antenna_rx_gain)))
         
         
         # d_1 = np.sqrt(2 * re) * (np.sqrt(ht) + np.sqrt(0))
@@ -223,7 +582,15 @@ class PropagationCalculator:
         
         
         
-        return E_total, P_r, E_fs, P_r_fs, np.abs(Gamma), np.abs(F_i)
+        results = (E_total, P_r, E_fs, P_r_fs, Gamma_abs, F_i)
+        
+        if self.diagnostics.enabled:
+            size = np.size(P_r)
+            self.diagnostics.count('samples_evaluated', size)
+            self.diagnostics.count('samples_beyond_horizon', int(np.count_nonzero(geometry.beyond_horizon)) * size // max(np.size(geometry.beyond_horizon), 1))
+        
+        # [()] devuelve escalares si las entradas eran escalares
+        return tuple(np.where(geometry.beyond_horizon, np.nan, x)[()] for x in results)
 
     # def calculate_calc_los(self, height_tx, height_rx):
     #     re = self.earth_radius_factor * EARTH_RADIUS
@@ -244,15 +611,19 @@ class PropagationCalculator:
     #         return Delta_R
 
         
+    #     from scipy.optimize import fsolve
     #     r_initial_guess = 50e0
     #     r_solution = fsolve(delta_r_function, r_initial_guess)
         
     #     self.LOS_point_to_point = r_solution[0]
     
-    def calculate_calc_los(self, height_tx, height_rx):
+    def calculate_radio_horizon(self, height_tx, height_rx):
         re = self.earth_radius_factor * EARTH_RADIUS
-        ht = height_tx
-        self.LOS_point_to_point = np.sqrt(2 * re) * (np.sqrt(height_tx) + np.sqrt(height_rx)) # radio horizonte
+        return np.sqrt(2 * re) * (np.sqrt(height_tx) + np.sqrt(height_rx)) # radio horizonte
+    
+    @timed('los')
+    def calculate_calc_los(self, height_tx, height_rx):
+        self.LOS_point_to_point = self.calculate_radio_horizon(height_tx, height_rx)
         
     
     def calculate_get_los(self):
@@ -262,33 +633,215 @@ class PropagationCalculator:
         return self.LOS_point_to_point
     
 
-    def calculate_variation_with_distance(self, height_tx, height_rx, distance_start, distance_end, distance_step):
-        distances = np.arange(distance_start, distance_end+distance_step, distance_step)
+    @timed('distance_sweep')
+    def calculate_variation_with_distance(self, height_tx, height_rx, distance_start, distance_end, distance_step, chunk_size=SWEEP_CHUNK_SIZE, progress=None, out=None):
+        # las distancias se generan de a bloques de chunk_size, así la memoria queda acotada por chunk_size;
+        # progress(hechos, total) se llama después de cada bloque. out: una ruta .npy, que se crea memory-mapped,
+        # o un array (p.ej. np.memmap) con la forma del resultado, que se llena bloque a bloque
+        n = _arange_length(distance_start, distance_end+distance_step, distance_step)
         
-        distances = distances[distances <= self.LOS_point_to_point]
+        # distancias dentro del radiohorizonte: son crecientes, así que es un prefijo
+        if n:
+            delta = (distance_start + distance_step) - distance_start
+            n_los = min(n, max(int((self.LOS_point_to_point - distance_start) // delta) + 2, 0))
+            while n_los > 0 and _arange_block(distance_start, distance_step, n_los - 1, n_los)[0] > self.LOS_point_to_point:
+                n_los -= 1
+            # se descartan sin evaluar, así que calculate_field no los cuenta
+            self.diagnostics.count('samples_beyond_horizon', n - n_los)
+            n = n_los
         
-        E_totals = []
-        P_rs = []
-        E_fss = []
-        P_r_fss = []
-        Gammas = []
-        F_is = []
+        result = DistanceSweepResult(n, _output_array(out, (len(DistanceSweepResult.COLUMNS), n)))
+        
+        for start in range(0, n, chunk_size):
+            block = slice(start, min(start + chunk_size, n))
+            distances = _arange_block(distance_start, distance_step, block.start, block.stop)
+            result.distances[block] = distances
+            result.data[1:, block] = self.calculate_point_to_point(height_tx, height_rx, distances)
+            
+            _release_pages(result.data)
+            
+            if progress is not None:
+                progress(block.stop, n)
+        
+        # distancia máxima dentro de radiohorizonte, stepizada
+        if n:
+            self.max_distance = result.distances[n - 1]
+        # self.max_distance = self.LOS_point_to_point
+        
+        return result
+    
+    def _interference(self, height_tx, height_rx, distance):
+        # fase de interferencia, separada en Delta (continua, sin envolver) y arg Gamma, y |F_i| en dB
+        geometry = self.calculate_reflection_geometry(height_tx, height_rx, distance)
+        Delta, Gamma = self.calculate_reflection(geometry)
+        Gamma_abs = np.abs(Gamma)
+        with np.errstate(invalid='ignore'):
+            F_i = np.sqrt(1 + Gamma_abs**2 + 2 * Gamma_abs * np.cos(Delta + np.angle(Gamma)))
+        return Delta, np.angle(Gamma), 20 * np.log10(np.fmax(F_i, ADAPTIVE_F_I_FLOOR))
 
-        for distance in distances:
-            E_total, P_r, E_fs, P_r_fs, Gamma, F_i = self.calculate_point_to_point(height_tx, height_rx, distance)
+    @timed('adaptive_distance_sweep')
+    def calculate_variation_with_distance_adaptive(self, height_tx, height_rx, distance_start, distance_end,
+                                                   phase_tolerance=ADAPTIVE_PHASE_TOLERANCE, db_tolerance=ADAPTIVE_DB_TOLERANCE,
+                                                   min_step=ADAPTIVE_MIN_STEP, initial_points=ADAPTIVE_INITIAL_POINTS,
+                                                   max_points=ADAPTIVE_MAX_POINTS):
+        # mismo rango que calculate_variation_with_distance: hasta el radiohorizonte, que ya queda enmascarado
+        distance_end = min(distance_end, np.nextafter(self.LOS_point_to_point, 0))
+        if distance_end < distance_start:
+            return DistanceSweepResult(0)
+        
+        # grilla uniforme de initial_points; los intervalos se bisecan hasta min_step o max_points evaluaciones,
+        # mirando solo la etapa de reflexión, y al final se evalúa el campo completo en las distancias elegidas
+        d = np.linspace(distance_start, distance_end, max(initial_points, 2))
+        samples = [d]
+        Delta, angle, F_i_db = self._interference(height_tx, height_rx, d)
+        
+        # intervalos a revisar, con los valores en sus extremos
+        a, b = d[:-1], d[1:]
+        Delta_a, Delta_b = Delta[:-1], Delta[1:]
+        angle_a, angle_b = angle[:-1], angle[1:]
+        db_a, db_b = F_i_db[:-1], F_i_db[1:]
+        n = len(d)
+        
+        while len(a) and n < max_points:
+            if n + len(a) > max_points:
+                # sin presupuesto para todos: primero los intervalos más anchos
+                keep = np.argsort(a - b, kind='stable')[:max_points - n]
+                a, b, Delta_a, Delta_b, angle_a, angle_b, db_a, db_b = (x[keep] for x in (a, b, Delta_a, Delta_b, angle_a, angle_b, db_a, db_b))
             
-            E_totals.append(E_total)
-            P_rs.append(P_r)
-            E_fss.append(E_fs)
-            P_r_fss.append(P_r_fs)
-            Gammas.append(Gamma)
-            F_is.append(F_i)
+            mid = (a + b) / 2
+            Delta_m, angle_m, db_m = self._interference(height_tx, height_rx, mid)
+            samples.append(mid)
+            n += len(mid)
             
-            # distancia máxima dentro de radiohorizonte, stepizada
-            self.max_distance = distances[len(E_totals)-1]
-            # self.max_distance = self.LOS_point_to_point
+            # la fase avanza rápido (muchos lóbulos por intervalo) o la interpolación lineal en dB falla (cerca de un nulo)
+            phase_step = np.abs((Delta_b - Delta_a) + _wrap_phase(angle_b - angle_a))
+            interpolation_error = np.abs(db_m - (db_a + db_b) / 2)
+            split = ((phase_step > phase_tolerance) | (interpolation_error > db_tolerance)) & ((b - a) / 2 > min_step)
+            
+            a, b = np.concatenate((a[split], mid[split])), np.concatenate((mid[split], b[split]))
+            Delta_a, Delta_b = np.concatenate((Delta_a[split], Delta_m[split])), np.concatenate((Delta_m[split], Delta_b[split]))
+            angle_a, angle_b = np.concatenate((angle_a[split], angle_m[split])), np.concatenate((angle_m[split], angle_b[split]))
+            db_a, db_b = np.concatenate((db_a[split], db_m[split])), np.concatenate((db_m[split], db_b[split]))
+        
+        distances = np.unique(np.concatenate(samples))
         
-        return distances, E_totals, P_rs, E_fss, P_r_fss, Gammas, F_is
+        result = DistanceSweepResult(len(distances))
+        result.distances[:] = distances
+        for start in range(0, len(distances), SWEEP_CHUNK_SIZE):
+            block = slice(start, start + SWEEP_CHUNK_SIZE)
+            result.data[1:, block] = self.calculate_point_to_point(height_tx, height_rx, distances[block])
+        
+        self.max_distance = distances[-1]
+        
+        return result
+    
+    def _phase_crossings(self, evaluate, grid, tolerance):
+        # posiciones donde la fase de interferencia Delta + arg Gamma cruza un múltiplo de pi, sobre una grilla
+        # creciente cuya fase ya se estima suave; evaluate(x) devuelve (Delta, arg Gamma) en las posiciones x
+        Delta, angle = evaluate(grid)
+        
+        # se refina la grilla hasta que la fase cambie menos de LOBE_BRACKET_PHASE entre puntos vecinos:
+        # así cada intervalo encierra a lo sumo un cruce y arg Gamma se desenvuelve sin ambigüedad
+        while True:
+            step = np.abs(np.diff(Delta) + _wrap_phase(np.diff(angle)))
+            split = (step > LOBE_BRACKET_PHASE) & (np.diff(grid) > 2 * tolerance)
+            if not split.any():
+                break
+            mid = (grid[:-1][split] + grid[1:][split]) / 2
+            Delta_m, angle_m = evaluate(mid)
+            order = np.argsort(np.concatenate((grid, mid)), kind='stable')
+            grid = np.concatenate((grid, mid))[order]
+            Delta = np.concatenate((Delta, Delta_m))[order]
+            angle = np.concatenate((angle, angle_m))[order]
+        
+        # fase continua: Delta ya lo es, arg Gamma se desenvuelve
+        angle_unwrapped = angle[0] + np.concatenate(([0], np.cumsum(_wrap_phase(np.diff(angle)))))
+        phase = Delta + angle_unwrapped
+        
+        # brackets: intervalos donde cambia floor(fase / pi); el múltiplo cruzado es el del extremo mayor
+        k = np.floor(phase / np.pi)
+        crossing = np.flatnonzero(k[:-1] != k[1:])
+        order = np.maximum(k[crossing], k[crossing + 1])
+        target = order * np.pi
+        
+        lo, hi = grid[crossing], grid[crossing + 1]
+        Delta_lo, angle_lo, phase_lo = Delta[crossing], angle[crossing], phase[crossing]
+        below = phase_lo < target  # la fase en lo queda de este lado del múltiplo
+        
+        # bisección de todos los brackets a la vez
+        if len(lo):
+            iterations = min(LOBE_MAX_ITERATIONS, max(int(np.ceil(np.log2(np.max(hi - lo) / tolerance))), 0))
+            for _ in range(iterations):
+                mid = (lo + hi) / 2
+                Delta_m, angle_m = evaluate(mid)
+                phase_m = phase_lo + (Delta_m - Delta_lo) + _wrap_phase(angle_m - angle_lo)
+                move_lo = (phase_m < target) == below
+                lo = np.where(move_lo, mid, lo)
+                hi = np.where(move_lo, hi, mid)
+                Delta_lo = np.where(move_lo, Delta_m, Delta_lo)
+                angle_lo = np.where(move_lo, angle_m, angle_lo)
+                phase_lo = np.where(move_lo, phase_m, phase_lo)
+        
+        return (lo + hi) / 2, order
+
+    def _interference_extrema(self, positions, order, geometry):
+        result = InterferenceExtremaResult(len(positions))
+        result.positions[:] = positions
+        result.order[:] = order
+        if len(positions):
+            E_total, P_r, _, _, _, F_i = self.calculate_field(geometry)
+            result.E_total[:], result.P_r[:], result.F_i[:] = E_total, P_r, F_i
+        return result
+
+    @timed('interference_extrema')
+    def calculate_interference_extrema_with_distance(self, height_tx, height_rx, distance_start, distance_end, tolerance=LOBE_TOLERANCE):
+        if distance_start <= 0:
+            raise ValueError("distance_start must be positive")
+        # hasta el radiohorizonte, que ya queda enmascarado
+        distance_end = min(distance_end, np.nextafter(self.LOS_point_to_point, 0))
+        if distance_end <= distance_start:
+            return InterferenceExtremaResult(0)
+        
+        def evaluate(distance):
+            Delta, Gamma = self.calculate_reflection(self.calculate_reflection_geometry(height_tx, height_rx, distance))
+            return Delta, np.angle(Gamma)
+        
+        # tierra plana: Delta ~ 2 Beta ht hr / r, la fase es casi lineal en 1/r
+        phase_span = 2 * self.Beta * height_tx * height_rx * (1 / distance_start - 1 / distance_end)
+        n = max(LOBE_MIN_POINTS, int(np.ceil(phase_span / LOBE_BRACKET_PHASE)) + 1)
+        grid = 1 / np.linspace(1 / distance_start, 1 / distance_end, n)
+        grid[0], grid[-1] = distance_start, distance_end
+        
+        # brackets en la grilla, refinada hasta LOBE_BRACKET_PHASE por intervalo; bisección hasta tolerance (m)
+        distances, order = self._phase_crossings(evaluate, grid, tolerance)
+        
+        return self._interference_extrema(distances, order, self.calculate_reflection_geometry(height_tx, height_rx, distances))
+
+    @timed('interference_extrema')
+    def calculate_interference_extrema_with_height(self, height_start, height_end, height_fixed, distance, vary_tx=True, tolerance=LOBE_TOLERANCE):
+        # alturas cuyo radiohorizonte alcanza la distancia de evaluación
+        re = self.earth_radius_factor * EARTH_RADIUS
+        height_min = max(distance / np.sqrt(2 * re) - np.sqrt(height_fixed), 0) ** 2
+        height_start = max(height_start, np.nextafter(height_min, np.inf))
+        if height_end <= height_start:
+            return InterferenceExtremaResult(0)
+        
+        def geometry(heights):
+            ht, hr = (heights, height_fixed) if vary_tx else (height_fixed, heights)
+            return self.calculate_reflection_geometry(ht, hr, distance)
+        
+        def evaluate(heights):
+            Delta, Gamma = self.calculate_reflection(geometry(heights))
+            return Delta, np.angle(Gamma)
+        
+        # tierra plana: Delta ~ 2 Beta ht hr / r, la fase es casi lineal en la altura
+        phase_span = 2 * self.Beta * height_fixed * (height_end - height_start) / distance
+        n = max(LOBE_MIN_POINTS, int(np.ceil(phase_span / LOBE_BRACKET_PHASE)) + 1)
+        grid = np.linspace(height_start, height_end, n)
+        
+        heights, order = self._phase_crossings(evaluate, grid, tolerance)
+        
+        return self._interference_extrema(heights, order, geometry(heights))
     
     # def calculate_fresnel_zones_checker(self, ht, hstart, hend, distance):
     #     re = self.earth_radius_factor * EARTH_RADIUS
@@ -310,74 +863,261 @@ class PropagationCalculator:
     #     # r2 = r - r1
     
     def calculate_fresnel_zones_checker(self, ht, hr, distance):
-        re = self.earth_radius_factor * EARTH_RADIUS
-        r = distance
-        
-        p = (2 / np.sqrt(3)) * np.sqrt(re * (hr + ht) + r*r/4)
-        
-        Xi = np.arcsin(2 * re * r * (hr - ht) / (p*p*p))
-        
-        r1 = r/2 - p * np.sin(Xi/3)
-        r2 = r - r1
+        # en forma cerrada, sin recorrer las zonas; alturas y distancia pueden ser arrays
+        geometry = self.calculate_reflection_geometry(ht, hr, distance)
         
-        # https://openjicareport.jica.go.jp/pdf/10455350_03.pdf
-        # página 5
-        # Se aproximaron d1 y d2 del PDF con las distancias curvas r1 y r2
-        # Además, el PDF no considera hp perpendicular a propagation line path
-        hp = ((ht * r2 + hr * r1) / (r1 + r2)) - (r1*r2 / (2 * re))
-        
-        n = 0
-        while(True):
-            fresnel_zn = np.sqrt((n + 1) * r1 * r2 * self.lambd / (r1 + r2))
+        return self.calculate_fresnel_clearance(geometry)
 
-            if hp < fresnel_zn:
-                break
+    @timed('fresnel')
+    def calculate_fresnel_clearance(self, geometry):
+        re = geometry.re
+        ht, hr, r1, r2 = geometry.ht, geometry.hr, geometry.r1, geometry.r2
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # https://openjicareport.jica.go.jp/pdf/10455350_03.pdf
+            # página 5
+            # Se aproximaron d1 y d2 del PDF con las distancias curvas r1 y r2
+            # Además, el PDF no considera hp perpendicular a propagation line path
+            hp = ((ht * r2 + hr * r1) / (r1 + r2)) - (r1*r2 / (2 * re))
             
-            n += 1
+            # radio de la zona n: sqrt(n) * fresnel_z1, así que la zona n está despejada
+            # si hp >= sqrt(n) * fresnel_z1, o sea n <= (hp / fresnel_z1)**2
+            fresnel_z1 = np.sqrt(r1 * r2 * self.lambd / (r1 + r2))
+            clearance = hp / fresnel_z1
+            
+            # hp < 0 o NaN => 0 zonas
+            n = np.floor(np.where(clearance > 0, clearance**2, 0)).astype(np.int64)
         
-        return n # "si n==0, no se pudo despejar ni la 1ra zona de fresnel"
+        return n[()], clearance[()] # "si n==0, no se pudo despejar ni la 1ra zona de fresnel"
 
-    def calculate_variation_with_height(self, height_start, height_end, height_step, height_fixed, vary_tx=True):
+    @timed('height_sweep')
+    def calculate_variation_with_height(self, height_start, height_end, height_step, height_fixed, distance, vary_tx=True, chunk_size=SWEEP_CHUNK_SIZE, progress=None):
+        # a la distancia dada, de a bloques de chunk_size alturas, sin modificar la calculadora;
+        # progress(hechos, total) se llama después de cada bloque
         heights = np.arange(height_start, height_end+height_step, height_step)
-        E_totals = []
-        P_rs = []
-        Gammas = []
-        F_is = []
-        fresnel_zones = []
         
-        distance = self.max_distance
-
-        valid_heights = []
-
-        for height in heights:
+        if vary_tx:
+            ht, hr = heights, height_fixed
+        else:
+            ht, hr = height_fixed, heights
+        
+        # alturas cuyo radiohorizonte no alcanza la distancia de evaluación
+        valid = distance < self.calculate_radio_horizon(ht, hr)
+        self.diagnostics.count('samples_beyond_horizon', int(np.count_nonzero(~valid)))
+        heights = heights[valid]
+        
+        result = HeightSweepResult(len(heights))
+        result.heights[:] = heights
+        
+        for start in range(0, len(heights), chunk_size):
+            block = slice(start, start + chunk_size)
             if vary_tx:
-                self.calculate_calc_los(height, height_fixed)
-                
-                if distance >= self.LOS_point_to_point:
-                    continue
-                
-                E_total, P_r, _, _, Gamma, F_i = self.calculate_point_to_point(height, height_fixed, distance)
-                fresnel_zone = self.calculate_fresnel_zones_checker(height, height_fixed, distance)
-                
+                ht = heights[block]
             else:
-                self.calculate_calc_los(height_fixed, height)
+                hr = heights[block]
+            
+            geometry = self.calculate_reflection_geometry(ht, hr, distance)
+            E_total, P_r, _, _, Gamma, F_i = self.calculate_field(geometry)
+            result.E_total[block] = E_total
+            result.P_r[block] = P_r
+            result.Gamma[block] = Gamma
+            result.F_i[block] = F_i
+            result.fresnel_zones[block], result.fresnel_clearance[block] = self.calculate_fresnel_clearance(geometry)
+            
+            if progress is not None:
+                progress(min(start + chunk_size, len(heights)), len(heights))
+
+        return result
+
+    @timed('coverage_grid')
+    def calculate_coverage_grid(self, distance_start, distance_end, distance_step, height_start, height_end, height_step, height_fixed, vary_tx=True, chunk_size=GRID_CHUNK_SIZE, out=None):
+        distances = np.arange(distance_start, distance_end+distance_step, distance_step)
+        heights = np.arange(height_start, height_end+height_step, height_step)
+        
+        # out como en calculate_variation_with_distance
+        result = CoverageGridResult(distances, heights, _output_array(out, (len(CoverageGridResult.LAYERS), len(heights), len(distances))))
+        
+        # bloques de a lo sumo chunk_size celdas, para no materializar todos los intermedios
+        cols_per_chunk = max(1, min(len(distances), chunk_size))
+        rows_per_chunk = max(1, chunk_size // max(1, len(distances)))
+        
+        for i in range(0, len(heights), rows_per_chunk):
+            h = heights[i:i+rows_per_chunk, np.newaxis]
+            ht, hr = (h, height_fixed) if vary_tx else (height_fixed, h)
+            
+            for j in range(0, len(distances), cols_per_chunk):
+                d = distances[j:j+cols_per_chunk]
+                block = (slice(i, i+rows_per_chunk), slice(j, j+cols_per_chunk))
                 
-                if distance >= self.LOS_point_to_point:
-                    continue
+                geometry = self.calculate_reflection_geometry(ht, hr, d)
+                E_total, P_r, _, _, _, _ = self.calculate_field(geometry)
+                _, clearance = self.calculate_fresnel_clearance(geometry)
                 
-                E_total, P_r, _, _, Gamma, F_i = self.calculate_point_to_point(height_fixed, height, distance)
-                fresnel_zone = self.calculate_fresnel_zones_checker(height, height_fixed, distance)
+                result.E_total[block] = E_total
+                result.P_r[block] = P_r
+                result.fresnel_clearance[block] = np.where(np.isnan(P_r), np.nan, clearance)
                 
-            valid_heights.append(height)
-            E_totals.append(E_total)
-            P_rs.append(P_r)
-            Gammas.append(Gamma)
-            F_is.append(F_i)
-            fresnel_zones.append(fresnel_zone)
+                _release_pages(result.data)
+        
+        return result
+
+    def _design_links(self, height_fixed, distances, p_r_min):
+        # enlaces en el eje 0, distancias de cada enlace en el eje 1: height_fixed y p_r_min escalares o uno por
+        # enlace, distances (n_distancias,) o (n_enlaces, n_distancias)
+        distances = np.atleast_1d(np.asarray(distances, dtype=np.float64))
+        height_fixed = np.atleast_1d(np.asarray(height_fixed, dtype=np.float64))
+        p_r_min = np.atleast_1d(np.asarray(p_r_min, dtype=np.float64))
+        n = np.broadcast_shapes(height_fixed.shape, p_r_min.shape, distances.shape[:-1] or (1,))[0]
+        distances = np.broadcast_to(distances, (n, distances.shape[-1]))
+        return np.broadcast_to(height_fixed, (n,)), distances, np.broadcast_to(p_r_min, (n,))
 
-        return valid_heights, E_totals, P_rs, Gammas, F_is, fresnel_zones
+    def _worst_case(self, ht, hr, distances):
+        # peor P_r y peor despeje sobre las distancias (último eje); NaN fuera del radiohorizonte, que nunca cumple
+        geometry = self.calculate_reflection_geometry(ht, hr, distances)
+        _, P_r, _, _, _, _ = self.calculate_field(geometry)
+        _, clearance = self.calculate_fresnel_clearance(geometry)
+        return np.min(P_r, axis=-1), np.min(clearance, axis=-1)
+
+    @timed('minimum_height')
+    def calculate_minimum_height(self, height_fixed, distances, p_r_min, vary_tx=True, min_clearance=DESIGN_MIN_CLEARANCE,
+                                 height_max=DESIGN_HEIGHT_MAX, tolerance=DESIGN_HEIGHT_TOLERANCE):
+        # cada enlace tiene que cumplir en todas sus distancias: dentro del radiohorizonte, P_r >= p_r_min y
+        # despeje >= min_clearance (None no lo exige). NaN si no se cumple hasta height_max
+        height_fixed, distances, p_r_min = self._design_links(height_fixed, distances, p_r_min)
+        n = len(p_r_min)
+        if min_clearance is None:
+            min_clearance = -np.inf
+        
+        def evaluate(index, heights):
+            # heights: (enlaces, k) -> cumple, peor P_r y peor despeje, (enlaces, k)
+            h = heights[..., np.newaxis]
+            hf = height_fixed[index, np.newaxis, np.newaxis]
+            ht, hr = (h, hf) if vary_tx else (hf, h)
+            P_r, clearance = self._worst_case(ht, hr, distances[index, np.newaxis, :])
+            with np.errstate(invalid='ignore'):
+                return (P_r >= p_r_min[index, np.newaxis]) & (clearance >= min_clearance), P_r, clearance
+        
+        # cota inferior: el radiohorizonte tiene que alcanzar la distancia más lejana
+        re = self.earth_radius_factor * EARTH_RADIUS
+        height_min = np.maximum(np.max(distances, axis=1) / np.sqrt(2 * re) - np.sqrt(height_fixed), 0) ** 2
+        height_min = np.nextafter(height_min, np.inf)
+        
+        # escaneo con paso menor que el período de los lóbulos en altura, lambda r / (2 h_fija) en tierra plana,
+        # en la distancia más corta; cada enlace se detiene en la primera altura que cumple
+        with np.errstate(divide='ignore'):
+            lobe = self.lambd * np.min(distances, axis=1) / (2 * height_fixed)
+        step = np.minimum(lobe / DESIGN_SCAN_PER_LOBE, (height_max - height_min) / DESIGN_MIN_SCAN_STEPS)
+        steps = np.where(height_max > height_min, np.floor((height_max - height_min) / step), -1).astype(np.int64) + 1
+        
+        found = np.full(n, -1, dtype=np.int64)  # primer paso que cumple, -1 si ninguno
+        active = np.flatnonzero(steps > 0)
+        j = 0
+        while len(active):
+            k = max(1, SWEEP_CHUNK_SIZE // (len(active) * distances.shape[1]))
+            heights = height_min[active, np.newaxis] + step[active, np.newaxis] * np.arange(j, j + k)
+            ok, _, _ = evaluate(active, heights)
+            ok &= np.arange(j, j + k) < steps[active, np.newaxis]
+            hit = ok.any(axis=1)
+            found[active[hit]] = j + np.argmax(ok[hit], axis=1)
+            j += k
+            active = active[~hit & (steps[active] > j)]
+        
+        # bisección entre el último paso que no cumple y el primero que cumple, todos los enlaces a la vez
+        index = np.flatnonzero(found > 0)
+        hi = height_min[index] + step[index] * found[index]
+        lo = hi - step[index]
+        if len(index):
+            iterations = max(int(np.ceil(np.log2(np.max(step[index]) / tolerance))), 0)
+            for _ in range(min(iterations, LOBE_MAX_ITERATIONS)):
+                mid = (lo + hi) / 2
+                ok, _, _ = evaluate(index, mid[:, np.newaxis])
+                ok = ok[:, 0]
+                lo = np.where(ok, lo, mid)
+                hi = np.where(ok, mid, hi)
+        
+        heights = np.full(n, np.nan)
+        heights[found == 0] = height_min[found == 0]
+        heights[index] = hi
+        
+        result = InverseDesignResult(n)
+        result.value[:] = heights
+        solved = np.flatnonzero(~np.isnan(heights))
+        result.P_r[:] = np.nan
+        result.fresnel_clearance[:] = np.nan
+        if len(solved):
+            _, result.P_r[solved], result.fresnel_clearance[solved] = (x[:, 0] for x in evaluate(solved, heights[solved, np.newaxis]))
+        
+        return result
+
+    @timed('minimum_tx_power')
+    def calculate_minimum_tx_power(self, height_tx, height_rx, distances, p_r_min, min_clearance=DESIGN_MIN_CLEARANCE):
+        ht = np.atleast_1d(np.asarray(height_tx, dtype=np.float64))
+        hr, distances, p_r_min = self._design_links(height_rx, distances, p_r_min)
+        ht = np.broadcast_to(ht, hr.shape)
+        if min_clearance is None:
+            min_clearance = -np.inf
+        
+        # P_r es proporcional a la potencia transmitida: la mínima sale directo del peor caso con tx_power
+        P_r, clearance = self._worst_case(ht[:, np.newaxis], hr[:, np.newaxis], distances)
+        with np.errstate(invalid='ignore'):
+            # el despeje y el radiohorizonte no dependen de la potencia
+            power = np.where(clearance >= min_clearance, self.tx_power * p_r_min / P_r, np.nan)
+        # sin solución (despeje o radiohorizonte): NaN en todas las columnas
+        feasible = np.isfinite(power)
+        power = np.where(feasible, power, np.nan)
+        
+        result = InverseDesignResult(len(power))
+        result.value[:] = power
+        result.P_r[:] = np.where(feasible, p_r_min, np.nan)
+        result.fresnel_clearance[:] = np.where(feasible, clearance, np.nan)
+        
+        return result
+
+    @timed('monte_carlo')
+    def calculate_monte_carlo_with_distance(self, height_tx, height_rx, distance_start, distance_end, distance_step, samples,
+                                            chunk_size=MONTE_CARLO_CHUNK_SIZE, progress=None):
+        # samples: parámetro del constructor (MONTE_CARLO_PARAMETERS) -> array (n,); el resto queda como en la calculadora
+        n = len(next(iter(samples.values()))) if samples else 1
+        _check_samples(samples)
+        
+        # copia con los parámetros muestreados como filas (1, n): cada muestra es una columna de la grilla
+        # distancia x muestra, y los no muestreados quedan escalares
+        calculator = copy.copy(self)
+        for name, values in samples.items():
+            values = np.asarray(values, dtype=np.float64)
+            if values.shape != (n,):
+                raise ValueError(f"Monte Carlo samples must all have shape ({n},), not {values.shape} for {name}")
+            setattr(calculator, MONTE_CARLO_PARAMETERS[name][0], values[np.newaxis, :])
+        
+        distances = np.arange(distance_start, distance_end+distance_step, distance_step)
+        result = MonteCarloResult(len(distances))
+        result.distances[:] = distances
+        
+        # bloques de distancias con todas las muestras, de unas chunk_size celdas: los percentiles necesitan la
+        # columna entera, así que la memoria queda acotada por chunk_size y n, no por el número de distancias
+        rows_per_chunk = max(1, chunk_size // n)
+        for start in range(0, len(distances), rows_per_chunk):
+            block = slice(start, start + rows_per_chunk)
+            geometry = calculator.calculate_reflection_geometry(height_tx, height_rx, distances[block, np.newaxis])
+            E_total, P_r, _, _, _, _ = calculator.calculate_field(geometry)
+            
+            beyond_horizon = np.broadcast_to(geometry.beyond_horizon, P_r.shape)
+            result.beyond_horizon[block] = np.mean(beyond_horizon, axis=1)
+            # sin señal en visibilidad directa fuera del radiohorizonte
+            P_r[beyond_horizon] = 0
+            E_total[beyond_horizon] = 0
+            
+            result.data[1:4, block] = np.percentile(P_r, MONTE_CARLO_PERCENTILES, axis=1)
+            result.data[4:7, block] = np.percentile(E_total, MONTE_CARLO_PERCENTILES, axis=1)
+            
+            if progress is not None:
+                progress(min(start + rows_per_chunk, len(distances)), len(distances))
+        
+        return result
 
     def plot_results(self, x_values, y_values, x_label, y_label, title):
+        import matplotlib.pyplot as plt
+        
         plt.figure()
         plt.plot(x_values, y_values)
         plt.xlabel(x_label)
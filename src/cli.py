@@ -0,0 +1,161 @@
+"""
+This script runs the propagation calculations from the command line, without the GUI.
+
+Only calculations (and therefore NumPy) is imported, so it starts quickly and runs on machines without a display,
+Qt or matplotlib. Inputs use the same units as the GUI (MHz, W, m, km) and default to the GUI defaults.
+Results are printed as CSV, or written to --output, with the columns of the corresponding result object
+in SI units and full precision. An --output ending in .npy is written as a binary result (see export.save_result),
+with the command line arguments as metadata. With --cache-dir (or $PROPAGATION_CACHE_DIR) sweeps already computed
+by an earlier run with the same inputs and model version are read back from that directory.
+
+Commands:
+    p2p: Point-to-point link at a single distance.
+    distance: Variation with distance (calculate_variation_with_distance), or with --adaptive
+        calculate_variation_with_distance_adaptive, which ignores --step and refines around the nulls.
+    height: Variation with the height of one antenna (calculate_variation_with_height).
+    design: Lowest antenna height (calculate_minimum_height) or Tx power (calculate_minimum_tx_power) that keeps
+        P_r >= --threshold (dBm) and the Fresnel clearance over the distances from --start to --end.
+
+With --extrema, distance and height print only the lobes and nulls of the interference pattern
+(calculate_interference_extrema_with_distance / _with_height) instead of the sampled curve.
+
+Usage:
+    python cli.py p2p --distance 8
+    python cli.py distance --start 1 --end 30 --step 0.01 --output vs_distancia.csv
+    python cli.py height --vary rx --start 1 --end 60 --step 0.5 --distance 10
+    python cli.py design --solve height --threshold -90 --start 5 --end 40
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from calculations import DESIGN_HEIGHT_MAX, DESIGN_MIN_CLEARANCE, DistanceSweepResult, PropagationCalculator
+from export import save_result
+from cache import DISK_CACHE_ENV, DiskResultCache, ResultCache
+
+ANTENNA_TYPES = {'dipole': 0, 'monopole': 1, 'isotropic': 2}
+ANTENNA_POLS = {'h': 0, 'v': 1}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="VHF-UHF Propagation Tool, command line.")
+
+    link = argparse.ArgumentParser(add_help=False)
+    link.add_argument('--freq', type=float, default=300, help="frequency (MHz)")
+    link.add_argument('--power', type=float, default=1, help="Tx power (W)")
+    link.add_argument('--ht', type=float, default=20, help="Tx antenna height (m)")
+    link.add_argument('--hr', type=float, default=20, help="Rx antenna height (m)")
+    link.add_argument('--conductivity', type=float, default=0.01, help="ground conductivity (S/m)")
+    link.add_argument('--permitivity', type=float, default=9, help="ground relative permittivity")
+    link.add_argument('--roughness', type=float, default=0, help="terrain roughness, hrms (m)")
+    link.add_argument('--k', type=float, default=1.33, help="effective earth radius factor")
+    link.add_argument('--antenna', choices=ANTENNA_TYPES, default='isotropic')
+    link.add_argument('--pol', choices=ANTENNA_POLS, default='h', help="antenna polarization")
+    link.add_argument('--output', '-o', help="CSV file to write instead of printing, or a .npy file for the binary result format")
+    link.add_argument('--cache-dir', default=os.environ.get(DISK_CACHE_ENV),
+                      help=f"on-disk cache of sweep results, shared between runs (default: ${DISK_CACHE_ENV})")
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p2p = commands.add_parser('p2p', parents=[link], help="point-to-point link")
+    p2p.add_argument('--distance', type=float, required=True, help="distance (km)")
+
+    distance = commands.add_parser('distance', parents=[link], help="variation with distance")
+    distance.add_argument('--start', type=float, default=1, help="start distance (km)")
+    distance.add_argument('--end', type=float, default=10, help="end distance (km)")
+    distance.add_argument('--step', type=float, default=1, help="distance step (km)")
+    distance.add_argument('--adaptive', action='store_true', help="sample adaptively, denser around the nulls (ignores --step)")
+    distance.add_argument('--extrema', action='store_true', help="only the lobes and nulls (ignores --step)")
+
+    height = commands.add_parser('height', parents=[link], help="variation with antenna height")
+    height.add_argument('--vary', choices=('tx', 'rx'), default='tx', help="antenna whose height varies; the other keeps --ht/--hr")
+    height.add_argument('--start', type=float, default=1, help="start height (m)")
+    height.add_argument('--end', type=float, help="end height (m), default twice the varied antenna height")
+    height.add_argument('--step', type=float, default=1, help="height step (m)")
+    height.add_argument('--distance', type=float, required=True, help="evaluation distance (km)")
+    height.add_argument('--extrema', action='store_true', help="only the lobes and nulls (ignores --step)")
+
+    design = commands.add_parser('design', parents=[link], help="minimum height or Tx power meeting a P_r threshold")
+    design.add_argument('--solve', choices=('height', 'power'), default='height', help="quantity to minimize")
+    design.add_argument('--vary', choices=('tx', 'rx'), default='tx', help="antenna whose height is solved; the other keeps --ht/--hr")
+    design.add_argument('--threshold', type=float, required=True, help="minimum received power (dBm)")
+    design.add_argument('--start', type=float, default=1, help="start distance (km)")
+    design.add_argument('--end', type=float, default=10, help="end distance (km)")
+    design.add_argument('--step', type=float, default=0.01, help="distance step (km) at which the threshold is checked")
+    design.add_argument('--clearance', type=float, default=DESIGN_MIN_CLEARANCE, help="minimum Fresnel clearance, hp / first zone radius")
+    design.add_argument('--max-height', type=float, default=DESIGN_HEIGHT_MAX, help="highest antenna height searched (m)")
+
+    return parser
+
+
+def run(args):
+    calculator = PropagationCalculator(args.freq * 1e6,
+                                       args.power,
+                                       args.conductivity,
+                                       args.permitivity,
+                                       args.roughness,
+                                       ANTENNA_TYPES[args.antenna],
+                                       ANTENNA_POLS[args.pol],
+                                       args.k)
+
+    cache = ResultCache(disk=DiskResultCache(args.cache_dir) if args.cache_dir else None)
+
+    if args.command == 'p2p':
+        distance = args.distance * 1000
+        results = calculator.calculate_point_to_point(args.ht, args.hr, distance)
+        return DistanceSweepResult(1, np.array([[distance, *results]]).T)
+
+    if args.command == 'design':
+        distances = np.arange(args.start * 1000, args.end * 1000 + args.step * 1000 / 2, args.step * 1000)
+        p_r_min = 10 ** ((args.threshold - 30) / 10)
+        if args.solve == 'power':
+            return cache.call(calculator, 'calculate_minimum_tx_power', args.ht, args.hr, distances, p_r_min, min_clearance=args.clearance)
+        vary_tx = args.vary == 'tx'
+        return cache.call(calculator, 'calculate_minimum_height', args.hr if vary_tx else args.ht, distances, p_r_min,
+                          vary_tx=vary_tx, min_clearance=args.clearance, height_max=args.max_height)
+
+    if args.command == 'distance':
+        distance_start, distance_end, distance_step = args.start * 1000, args.end * 1000, args.step * 1000
+
+        calculator.calculate_calc_los(args.ht, args.hr)
+        if args.extrema:
+            return cache.call(calculator, 'calculate_interference_extrema_with_distance', args.ht, args.hr, distance_start, distance_end)
+        if args.adaptive:
+            return cache.call(calculator, 'calculate_variation_with_distance_adaptive', args.ht, args.hr, distance_start, distance_end)
+        if distance_start == 0: distance_start = distance_step
+        # a un .npy se escribe directo, memory-mapped, sin tener el barrido entero en memoria
+        out = args.output if args.output and args.output.endswith('.npy') else None
+        result = cache.call(calculator, 'calculate_variation_with_distance', args.ht, args.hr, distance_start, distance_end, distance_step, out=out)
+    else:
+        vary_tx = args.vary == 'tx'
+        height_fixed = args.hr if vary_tx else args.ht
+        height_end = args.end if args.end is not None else 2 * (args.ht if vary_tx else args.hr)
+
+        if args.extrema:
+            return cache.call(calculator, 'calculate_interference_extrema_with_height', args.start, height_end, height_fixed, args.distance * 1000, vary_tx=vary_tx)
+        result = cache.call(calculator, 'calculate_variation_with_height', args.start, height_end, args.step, height_fixed, args.distance * 1000, vary_tx=vary_tx)
+
+    return result
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'distance' and args.extrema and args.start <= 0:
+        parser.error("--extrema needs a positive --start")
+    result = run(args)
+
+    if args.output and args.output.endswith('.npy'):
+        metadata = {key: value for key, value in vars(args).items() if key != 'output'}
+        save_result(args.output, result, metadata)
+        return
+
+    output = args.output if args.output else sys.stdout
+    np.savetxt(output, result.data.T, fmt='%.17g', delimiter=',', header=','.join(result.COLUMNS), comments='')
+
+
+if __name__ == "__main__":
+    main()
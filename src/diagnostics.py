@@ -0,0 +1,156 @@
+"""
+This module provides lightweight named timing spans and counters, used by PropagationCalculator and the GUI to show
+where a run spends its time.
+
+A disabled Diagnostics records nothing: span() returns a shared no-op context manager and the timed decorator calls
+the method straight through. Enabled, each span costs two perf_counter calls and a dict update, so spans wrap
+whole stages and array passes, never single samples.
+
+Classes:
+    Diagnostics: Accumulates spans (calls, total and max seconds) and counters.
+
+Diagnostics:
+    Methods:
+        __init__(self, enabled=True): Creates an empty, optionally disabled, recorder.
+        span(self, name): Context manager that adds its elapsed time to the span name.
+        laps(self): Returns a stopwatch for consecutive stages: laps.start(name) closes the previous span and
+            opens the next one, laps.stop() closes the last one.
+        add_span(self, name, elapsed): Adds an already measured time, in seconds, to the span name.
+        count(self, name, n=1): Adds n to the counter name.
+        reset(self): Drops every span and counter.
+        report(self): Returns the spans and counters as a dict, ready for JSON.
+        format(self): Returns the report as a text table.
+        dump_json(self, path): Writes the report to a JSON file.
+
+Functions:
+    timed(name): Decorator for methods of objects with a diagnostics attribute, recording each call as a span.
+"""
+
+import functools
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('diagnostics', 'name', 'start')
+
+    def __init__(self, diagnostics, name):
+        self.diagnostics = diagnostics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.diagnostics.add_span(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Laps:
+    __slots__ = ('diagnostics', 'name', 'start_time')
+
+    def __init__(self, diagnostics):
+        self.diagnostics = diagnostics
+        self.name = None
+
+    def start(self, name):
+        now = time.perf_counter()
+        if self.name is not None:
+            self.diagnostics.add_span(self.name, now - self.start_time)
+        self.name = name
+        self.start_time = now
+
+    def stop(self):
+        if self.name is not None:
+            self.diagnostics.add_span(self.name, time.perf_counter() - self.start_time)
+            self.name = None
+
+
+class _NoLaps:
+    __slots__ = ()
+
+    def start(self, name):
+        pass
+
+    def stop(self):
+        pass
+
+
+_NO_LAPS = _NoLaps()
+
+
+class Diagnostics:
+    """
+    Named timing spans and counters. Safe to share between the GUI thread and a worker thread.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.spans = {}     # nombre -> [llamadas, segundos totales, segundos máximos]
+        self.counters = {}  # nombre -> total
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else _NO_SPAN
+
+    def laps(self):
+        return _Laps(self) if self.enabled else _NO_LAPS
+
+    def add_span(self, name, elapsed):
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, elapsed, elapsed]
+            else:
+                span[0] += 1
+                span[1] += elapsed
+                span[2] = max(span[2], elapsed)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+            self.counters = {}
+
+    def report(self):
+        with self.lock:
+            spans = {name: {'calls': calls, 'total_s': total, 'max_s': maximum}
+                     for name, (calls, total, maximum) in self.spans.items()}
+            return {'spans': spans, 'counters': dict(self.counters)}
+
+    def format(self):
+        report = self.report()
+        lines = [f"{'span':28s} {'calls':>7s} {'total (ms)':>12s} {'max (ms)':>10s}"]
+        for name, span in report['spans'].items():
+            lines.append(f"{name:28s} {span['calls']:7d} {span['total_s'] * 1e3:12.2f} {span['max_s'] * 1e3:10.2f}")
+        if report['counters']:
+            lines.append('')
+            lines.append(f"{'counter':28s} {'total':>12s}")
+            for name, total in report['counters'].items():
+                lines.append(f"{name:28s} {total:12d}")
+        return '\n'.join(lines)
+
+    def dump_json(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=1)
+
+
+def timed(name):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            diagnostics = self.diagnostics
+            if not diagnostics.enabled:
+                return method(self, *args, **kwargs)
+            with diagnostics.span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
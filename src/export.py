@@ -0,0 +1,119 @@
+"""
+This module writes result arrays to files, straight from the numeric arrays and without going through the GUI tables.
+
+CSV files start with a metadata block between '_metadata_start' and '_metadata_end' rows, followed by a header row
+and the data, written in chunks so large sweeps never need to be formatted as a whole.
+
+Binary results are a standard .npy file holding the result's data block (one row per column, or one layer per
+grid quantity) plus a .json file with the same name describing it: result type, column names, grid axes and
+the run parameters as structured metadata. The .npy is read back memory-mapped, so a large result can be
+sliced or re-plotted without loading it into RAM.
+
+Functions:
+    write_csv(file, headers, columns, metadata=(), precision=CSV_PRECISION, chunk_size=EXPORT_CHUNK_SIZE):
+        Writes the columns as CSV, with the metadata block and the given number of significant digits.
+    save_result(path, result, metadata=None):
+        Writes a DistanceSweepResult, HeightSweepResult, InterferenceExtremaResult, InverseDesignResult,
+        MonteCarloResult or CoverageGridResult as .npy + .json. A result computed with out=path already holds its
+        .npy, so only the .json is written.
+    load_result(path, mmap_mode='r'):
+        Reads a result written by save_result, memory-mapped by default. Returns (result, metadata).
+"""
+
+import csv
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from calculations import (CoverageGridResult, DistanceSweepResult, HeightSweepResult, InterferenceExtremaResult,
+                          InverseDesignResult, MonteCarloResult)
+
+CSV_PRECISION = 17  # dígitos significativos; 17 alcanzan para recuperar exactamente un float64
+EXPORT_CHUNK_SIZE = 2**16  # filas formateadas por bloque
+
+RESULT_FORMAT_VERSION = 1
+RESULT_TYPES = {cls.__name__: cls for cls in (DistanceSweepResult, HeightSweepResult, InterferenceExtremaResult,
+                                              InverseDesignResult, MonteCarloResult, CoverageGridResult)}
+
+
+def write_csv(file, headers, columns, metadata=(), precision=CSV_PRECISION, chunk_size=EXPORT_CHUNK_SIZE):
+    if isinstance(file, str):
+        with open(file, 'w', newline='') as f:
+            return write_csv(f, headers, columns, metadata, precision, chunk_size)
+
+    columns = [np.asarray(column) for column in columns]
+    n = len(columns[0]) if columns else 0
+
+    writer = csv.writer(file)
+
+    # metadata
+    writer.writerow(['_metadata_start'])
+    writer.writerow(['Fecha y hora', datetime.now(timezone.utc)])
+    for line in metadata:
+        writer.writerow([line])
+    writer.writerow(['_metadata_end'])
+
+    # headers
+    writer.writerow(headers)
+
+    # data, de a bloques
+    fmt = f'%.{precision}g'
+    for start in range(0, n, chunk_size):
+        block = np.column_stack([column[start:start + chunk_size] for column in columns])
+        np.savetxt(file, block, fmt=fmt, delimiter=',', newline=writer.dialect.lineterminator)
+
+    return n
+
+
+def _result_paths(path):
+    stem = path[:-len('.npy')] if path.endswith('.npy') else path
+    return stem + '.npy', stem + '.json'
+
+
+def save_result(path, result, metadata=None):
+    data_path, header_path = _result_paths(path)
+
+    header = {'format_version': RESULT_FORMAT_VERSION, 'type': type(result).__name__}
+    if isinstance(result, CoverageGridResult):
+        header['layers'] = list(result.LAYERS)
+        header['distances'] = np.asarray(result.distances).tolist()
+        header['heights'] = np.asarray(result.heights).tolist()
+    else:
+        header['columns'] = list(result.COLUMNS)
+    header['metadata'] = metadata or {}
+
+    # primero los datos: un .json presente implica un .npy completo. Si el resultado ya se calculó
+    # memory-mapped sobre ese mismo .npy (out=ruta), solo falta el encabezado
+    data = result.data
+    if not (isinstance(data, np.memmap) and data.filename and os.path.abspath(data.filename) == os.path.abspath(data_path)):
+        np.save(data_path, data)
+    with open(header_path, 'w') as file:
+        json.dump(header, file, indent=1)
+
+
+def load_result(path, mmap_mode='r'):
+    data_path, header_path = _result_paths(path)
+
+    with open(header_path) as file:
+        header = json.load(file)
+    if header.get('format_version') != RESULT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported result format version {header.get('format_version')} in {header_path}")
+
+    cls = RESULT_TYPES.get(header.get('type'))
+    if cls is None:
+        raise ValueError(f"Unknown result type {header.get('type')} in {header_path}")
+
+    data = np.load(data_path, mmap_mode=mmap_mode)
+
+    if cls is CoverageGridResult:
+        if tuple(header['layers']) != cls.LAYERS:
+            raise ValueError(f"{header_path} layers {header['layers']} do not match {cls.LAYERS}")
+        result = cls(np.array(header['distances']), np.array(header['heights']), data)
+    else:
+        if tuple(header['columns']) != cls.COLUMNS:
+            raise ValueError(f"{header_path} columns {header['columns']} do not match {cls.COLUMNS}")
+        result = cls(data.shape[1], data)
+
+    return result, header['metadata']
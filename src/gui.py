@@ -3,55 +3,124 @@ This module contains the implementation of the main GUI for the VHF-UHF Propagat
 
 Classes:
     Cursor: A class to create a crosshair cursor for matplotlib plots.
+    LevelOfDetail: Draws a min/max-per-pixel decimation of large sweeps, redone on zoom and pan.
+    ResultTableModel: A read-only table model that formats result arrays on demand, used by both tables.
+    CalculationWorker: A QThread that runs the distance and height sweeps off the GUI thread, reusing cached sweeps.
     MainWindow: The main window class for the VHF-UHF Propagation Tool GUI.
 
 Cursor:
     Methods:
-        __init__(self, ax): Initializes the Cursor with the given axes.
+        __init__(self, ax): Initializes the Cursor with the given axes and connects it to the canvas.
+        on_draw(self, event): Caches the axes background after a full draw and draws the crosshair over it.
+        blit(self): Restores the cached background, draws the crosshair and blits the axes.
         set_cross_hair_visible(self, visible): Sets the visibility of the crosshair.
-        on_mouse_move(self, event): Updates the crosshair position based on mouse movement.
+        on_mouse_move(self, event): Updates the crosshair position based on mouse movement, blitting it.
+
+LevelOfDetail:
+    Methods:
+        __init__(self, ax): Connects to the x limit and resize events of the axes.
+        set_data(self, artist, x, y): Stores the full-resolution data of a line or scatter and draws it decimated.
+        get_data(self, artist): Returns the full-resolution data of an artist.
+        update(self, artist): Decimates an artist for the current x limits and axes width.
+
+CalculationWorker:
+    Methods:
+        __init__(self, calculator, inputs, cache): Stores the calculator, the parsed inputs and the result cache.
+        cancel(self): Asks the worker to stop at the next chunk boundary.
+        report_progress(self, offset): Returns a progress callback for one sweep, raising once the run is cancelled.
+        run(self): Runs both sweeps and emits results, or failed with the error message.
 
 MainWindow:
     Methods:
         __init__(self): Initializes the main window and sets up the UI components.
-        calculate(self): Performs the propagation calculations and updates the plots and tables.
-        export_table_to_csv(self, table, default_filename): Exports the given table to a CSV file.
+        create_result_table(self): Adds a read-only result table, sorted ascending by its first column, to the table layout.
+        setup_plots(self): Creates the axes, lines, scatters and cursors once; each run only updates their data.
+        calculate(self): Parses the inputs and starts a CalculationWorker, superseding any run in progress.
+        cancel_calculation(self): Cancels the run in progress, if any.
+        calculation_finished(self, worker): Releases a finished worker and hides the progress bar if it was the current run.
+        show_calculation_error(self, message): Shows the error of a failed run in a message box.
+        closeEvent(self, event): Cancels the run in progress and waits for every worker before closing.
+        show_results(self, inputs, distance_result, height_result): Updates the plots and tables with a finished run.
+        export_table_to_csv(self, table, default_filename): Exports the arrays behind the given table to a CSV file, at the chosen
+            precision, or the full result to a binary .npy + .json pair.
         scatter_checkbox_changed(self): Handles the state change of the scatter checkbox.
         fs_checkbox_changed(self): Handles the state change of the free space checkbox.
         databox_checkbox_changed(self): Handles the state change of the data box checkbox.
+        time_canvas_draws(self, canvas): Records every full draw of the canvas as the 'render' span of the current run.
+        toggle_diagnostics(self): Enables stage timing for the next runs and unfolds the diagnostics panel.
+        update_diagnostics(self): Shows the spans and counters of the last run in the diagnostics panel.
+        export_diagnostics(self): Writes the spans and counters of the last run to a JSON file.
+
+Functions:
+    decimate_min_max(x, y, x_min, x_max, buckets): Indices that keep the min and max of y in each x bucket.
 """
 
 from PyQt6.QtWidgets import QApplication, QMainWindow, QTableWidget, QTableWidgetItem, QMenu
-from PyQt6.QtGui import QAction, QIcon
+from PyQt6.QtGui import QAction, QIcon, QFontDatabase
 from design import Ui_MainWindow  
 from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QVBoxLayout, QPushButton, QComboBox, QMessageBox, QGridLayout, QTableWidget, QTableWidgetItem, QCheckBox, QFileDialog, QFormLayout
-from PyQt6.QtCore import pyqtSlot, Qt
+from PyQt6.QtCore import pyqtSlot, pyqtSignal, Qt, QThread, QTimer, QAbstractTableModel, QModelIndex
+from PyQt6.QtWidgets import QProgressBar, QTableView, QSpinBox, QPlainTextEdit, QHBoxLayout
 from matplotlib import pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.backend_bases import MouseEvent
 from PyQt6.QtCore import pyqtSlot
 from PyQt6.QtWidgets import QVBoxLayout
-from datetime import datetime, timezone
 from calculations import PropagationCalculator
+from export import CSV_PRECISION, save_result, write_csv
+from diagnostics import Diagnostics
+from cache import DISK_CACHE_ENV, DiskResultCache, ResultCache
 import numpy as np
 import mplcursors
-import csv
+import os
+import time
 
 PLOT_Y_MARGIN = 5
 PLOT_Y_MARGIN_FACTOR = 0.1
 PLOT_X_MARGIN_FACTOR = 0.05
 
+CURSOR_MAX_FPS = 60
+
+LOD_MIN_BUCKETS = 200  # mínimo de columnas de píxeles para decimar, por si el eje todavía no tiene tamaño
+
 class Cursor:
     """
-    A cross hair cursor.
+    A cross hair cursor, drawn by blitting over a cached background of the axes.
+    The background is refreshed on every full draw of the canvas, and mouse moves redraw only the two lines,
+    at most CURSOR_MAX_FPS times per second; a move dropped by that cap is drawn once the interval has passed.
     """
     def __init__(self, ax):
         self.ax = ax
-        self.horizontal_line = ax.axhline(color='w', lw=0.8, ls='--')
-        self.vertical_line = ax.axvline(color='w', lw=0.8, ls='--')
+        self.canvas = ax.figure.canvas
+        self.background = None
+        self.last_blit = 0
+        # blit diferido de la última posición, para que el cursor no quede atrás cuando el mouse se detiene
+        self.pending_blit = QTimer()
+        self.pending_blit.setSingleShot(True)
+        self.pending_blit.timeout.connect(self.blit)
+        # animated: quedan fuera del draw normal, así el fondo cacheado no las incluye
+        self.horizontal_line = ax.axhline(color='w', lw=0.8, ls='--', animated=True)
+        self.vertical_line = ax.axvline(color='w', lw=0.8, ls='--', animated=True)
         # text location in axes coordinates
         #self.text = ax.text(0.72, 0.9, '', transform=ax.transAxes)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        # sólo se dibuja sobre el buffer: el paintEvent en curso lo muestra, y un canvas.blit acá repintaría recursivamente
+        if self.horizontal_line.get_visible():
+            self.ax.draw_artist(self.horizontal_line)
+            self.ax.draw_artist(self.vertical_line)
+
+    def blit(self):
+        self.pending_blit.stop()
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.horizontal_line)
+        self.ax.draw_artist(self.vertical_line)
+        self.canvas.blit(self.ax.bbox)
+        self.last_blit = time.perf_counter()
 
     def set_cross_hair_visible(self, visible):
         need_redraw = self.horizontal_line.get_visible() != visible
@@ -61,18 +130,196 @@ class Cursor:
         return need_redraw
 
     def on_mouse_move(self, event):
-        if not event.inaxes:
+        if self.background is None:
+            return
+        
+        # con ejes gemelos (twinx) event.inaxes puede ser el gemelo, así que se usa la posición en píxeles
+        if not self.ax.bbox.contains(event.x, event.y):
             need_redraw = self.set_cross_hair_visible(False)
             if need_redraw:
-                self.ax.figure.canvas.draw()
+                self.blit()
         else:
-            self.set_cross_hair_visible(True)
-            x, y = event.xdata, event.ydata
+            need_redraw = self.set_cross_hair_visible(True)
+            x, y = self.ax.transData.inverted().transform((event.x, event.y))
             # update the line positions
             self.horizontal_line.set_ydata([y])
             self.vertical_line.set_xdata([x])
             #self.text.set_text(f'x={x:1.2f}, y={y:1.2f}')
-            self.ax.figure.canvas.draw()
+            wait = 1 / CURSOR_MAX_FPS - (time.perf_counter() - self.last_blit)
+            if need_redraw or wait <= 0:
+                self.blit()
+            elif not self.pending_blit.isActive():
+                self.pending_blit.start(int(np.ceil(wait * 1000)))
+
+
+def decimate_min_max(x, y, x_min, x_max, buckets):
+    """
+    Returns the indices of the samples to draw for x in [x_min, x_max], keeping the minimum and maximum of y
+    in each of the given number of equal-width x buckets. x must be sorted.
+    """
+    # un punto más a cada lado, para que la línea llegue hasta el borde del eje
+    lo, hi = np.searchsorted(x, [x_min, x_max])
+    lo, hi = max(lo - 1, 0), min(hi + 1, len(x))
+    if hi - lo <= 2 * buckets or x[hi - 1] == x[lo]:
+        return np.arange(lo, hi)
+
+    x, y = x[lo:hi], y[lo:hi]
+    bucket = ((x - x[0]) * (buckets / (x[-1] - x[0]))).astype(np.intp)
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    counts = np.diff(starts, append=len(x))
+
+    keep = [starts, starts + counts - 1]
+    # primer mínimo y primer máximo de cada bucket; los NaN solo quedan si el bucket es todo NaN
+    for extreme, fill in ((np.minimum, np.inf), (np.maximum, -np.inf)):
+        values = np.where(np.isnan(y), fill, y)
+        hits = np.flatnonzero(values == np.repeat(extreme.reduceat(values, starts), counts))
+        keep.append(hits[np.unique(bucket[hits], return_index=True)[1]])
+
+    return lo + np.unique(np.concatenate(keep))
+
+
+class LevelOfDetail:
+    """
+    Keeps the full-resolution data of the lines and scatters of an axes and draws only a min/max-per-pixel
+    decimation of the visible range, so peaks and nulls survive. It re-decimates when the x limits change
+    (zoom, pan, a new run) and when the canvas is resized.
+    """
+    def __init__(self, ax):
+        self.ax = ax
+        self.series = {}
+        self.cids = [ax.callbacks.connect('xlim_changed', self.on_xlim_changed),
+                     ax.figure.canvas.mpl_connect('resize_event', self.on_xlim_changed)]
+
+    def set_data(self, artist, x, y):
+        self.series[artist] = (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        self.update(artist)
+
+    def get_data(self, artist):
+        return self.series[artist]
+
+    def update(self, artist):
+        x, y = self.series[artist]
+        x_min, x_max = sorted(self.ax.get_xlim())
+        buckets = max(int(self.ax.bbox.width), LOD_MIN_BUCKETS)
+        keep = decimate_min_max(x, y, x_min, x_max, buckets)
+
+        if hasattr(artist, 'set_offsets'):
+            artist.set_offsets(np.column_stack((x[keep], y[keep])))
+        else:
+            artist.set_data(x[keep], y[keep])
+
+    def on_xlim_changed(self, *args):
+        for artist in self.series:
+            self.update(artist)
+
+
+class ResultTableModel(QAbstractTableModel):
+    """
+    Read-only table over result arrays, one array per column.
+    Cells are formatted only when the view asks for them, and sorting permutes an index array instead of the data.
+    """
+    def __init__(self, headers=(), columns=(), fmt='.2e'):
+        super().__init__()
+        self.fmt = fmt
+        self.set_columns(headers, columns)
+
+    def set_columns(self, headers, columns):
+        self.beginResetModel()
+        self.headers = list(headers)
+        self.columns = [np.asarray(column) for column in columns]
+        self.order = np.arange(len(self.columns[0]) if self.columns else 0)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def display(self, row, column):
+        return format(self.columns[column][self.order[row]], self.fmt)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self.display(index.row(), index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.order = np.argsort(self.columns[column], kind='stable')
+        if order == Qt.SortOrder.DescendingOrder:
+            self.order = self.order[::-1]
+        self.layoutChanged.emit()
+
+
+class CalculationCancelled(Exception):
+    pass
+
+
+class CalculationWorker(QThread):
+    """
+    Runs the distance and height sweeps off the GUI thread.
+    Emits progress (0-100) after each chunk and results once both sweeps are done.
+    cancel() stops it at the next chunk boundary, without emitting results.
+    """
+    progress = pyqtSignal(int)
+    results = pyqtSignal(object, object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, calculator, inputs, cache):
+        super().__init__()
+        self.calculator = calculator
+        self.inputs = inputs
+        self.cache = cache
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report_progress(self, offset):
+        def report(done, total):
+            if self.cancelled:
+                raise CalculationCancelled()
+            self.progress.emit(offset + 50 * done // max(total, 1))
+        return report
+
+    def run(self):
+        inputs = self.inputs
+        laps = self.calculator.diagnostics.laps()
+        laps.start('worker')
+        try:
+            # los barridos que no cambiaron se toman de la caché
+            distance_result = self.cache.call(self.calculator, 'calculate_variation_with_distance', inputs['height_tx'], inputs['height_rx'],
+                                              inputs['distance_start'], inputs['distance_end'], inputs['distance_step'],
+                                              progress=self.report_progress(0))
+            if len(distance_result) == 0:
+                raise ValueError("Ninguna distancia queda dentro del radiohorizonte")
+            
+            # se evalúa en la distancia máxima dentro de radiohorizonte, stepizada
+            if inputs['vary_tx']:
+                height_result = self.cache.call(self.calculator, 'calculate_variation_with_height', 1, 2 * inputs['height_tx'], inputs['height_step'], inputs['height_rx'],
+                                                distance_result.distances[-1], vary_tx=True,
+                                                progress=self.report_progress(50))
+            else:
+                height_result = self.cache.call(self.calculator, 'calculate_variation_with_height', 1, 2 * inputs['height_rx'], inputs['height_step'], inputs['height_tx'],
+                                                distance_result.distances[-1], vary_tx=False,
+                                                progress=self.report_progress(50))
+        except CalculationCancelled:
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        
+        laps.stop()
+        if not self.cancelled:
+            self.results.emit(inputs, distance_result, height_result)
 
 
 class MainWindow(QMainWindow, Ui_MainWindow):
@@ -125,18 +372,69 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.figure4.set_constrained_layout(True)
         self.toolbar4.hide()
         
-        self.table1 = QTableWidget()
-        self.ui.table_layout.addWidget(self.table1)
-
-        self.table2 = QTableWidget()
-        self.ui.table_layout.addWidget(self.table2)
+        self.table1 = self.create_result_table()
+        self.table2 = self.create_result_table()
         
         self.ui.calculate_button.clicked.connect(self.calculate)
         
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setStyleSheet("color: rgb(238, 238, 238);")
+        self.progress_bar.hide()
+        self.ui.horizontalLayout_7.addWidget(self.progress_bar)
+        
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.setStyleSheet("color: rgb(238, 238, 238);")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_calculation)
+        self.ui.horizontalLayout_7.addWidget(self.cancel_button)
+        
+        self.precision_input = QSpinBox()
+        self.precision_input.setRange(3, CSV_PRECISION)
+        self.precision_input.setValue(CSV_PRECISION)
+        self.precision_input.setPrefix("Dígitos: ")
+        self.precision_input.setToolTip("Dígitos significativos al exportar las tablas")
+        self.precision_input.setStyleSheet("color: rgb(238, 238, 238);")
+        self.ui.horizontalLayout_7.insertWidget(self.ui.horizontalLayout_7.indexOf(self.ui.pushExp1), self.precision_input)
+        
+        self.diagnostics_checkbox = QCheckBox("Diagnóstico")
+        self.diagnostics_checkbox.setToolTip("Registra el tiempo de cada etapa de la próxima corrida")
+        self.diagnostics_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
+        self.diagnostics_checkbox.stateChanged.connect(self.toggle_diagnostics)
+        self.ui.horizontalLayout_7.insertWidget(self.ui.horizontalLayout_7.indexOf(self.precision_input), self.diagnostics_checkbox)
+        
+        # panel de diagnóstico, plegado hasta que se habilita
+        self.diagnostics = Diagnostics(enabled=False)
+        self.diagnostics_text = QPlainTextEdit()
+        self.diagnostics_text.setReadOnly(True)
+        self.diagnostics_text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.diagnostics_text.setStyleSheet("color: rgb(238, 238, 238);")
+        self.diagnostics_text.setMaximumHeight(160)
+        diagnostics_export_button = QPushButton("Exportar JSON")
+        diagnostics_export_button.setStyleSheet("color: rgb(238, 238, 238);")
+        diagnostics_export_button.clicked.connect(self.export_diagnostics)
+        self.diagnostics_panel = QWidget()
+        diagnostics_layout = QHBoxLayout(self.diagnostics_panel)
+        diagnostics_layout.setContentsMargins(0, 0, 0, 0)
+        diagnostics_layout.addWidget(self.diagnostics_text)
+        diagnostics_layout.addWidget(diagnostics_export_button, alignment=Qt.AlignmentFlag.AlignTop)
+        self.diagnostics_panel.hide()
+        self.ui.verticalLayout.addWidget(self.diagnostics_panel)
+        for canvas in (self.canvas1, self.canvas2, self.canvas3, self.canvas4):
+            self.time_canvas_draws(canvas)
+        
+        self.setup_plots()
+        
+        # con PROPAGATION_CACHE_DIR definida, los barridos también se guardan en disco, entre sesiones
+        cache_dir = os.environ.get(DISK_CACHE_ENV)
+        self.result_cache = ResultCache(disk=DiskResultCache(cache_dir) if cache_dir else None)
+        self.worker = None   # corrida en curso
+        self.workers = []    # corridas que todavía no terminaron, incluidas las canceladas
+        
         self.ui.pushExp1.clicked.connect(lambda: self.export_table_to_csv(self.table1, 'vs_distancia.csv'))
         self.ui.pushExp2.clicked.connect(lambda: self.export_table_to_csv(self.table2, 'vs_altura.csv'))
         
         self.metadata_str = ''
+        self.results = {}  # tabla -> (resultado, metadata), para la exportación binaria
         
         self.ui.scatter_checkbox.stateChanged.connect(self.scatter_checkbox_changed)
         self.ui.fs_checkbox.stateChanged.connect(self.fs_checkbox_changed)
@@ -147,8 +445,22 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.ui.toolbar_checkbox.stateChanged.connect(lambda: self.toolbar4.setVisible(not self.toolbar4.isVisible()))
         
     
+    def create_result_table(self):
+        table = QTableView()
+        table.setModel(ResultTableModel())
+        table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        # setSortingEnabled ordena por el indicador del encabezado, que en Qt arranca descendente
+        table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.ui.table_layout.addWidget(table)
+        return table
+
     @pyqtSlot()
     def calculate(self):
+        run_start = time.perf_counter()
+        diagnostics = Diagnostics(enabled=self.diagnostics_checkbox.isChecked())
+        laps = diagnostics.laps()
+        laps.start('parse_inputs')
+        
         try:
             try:
                 freq = float(self.ui.frequency_input.text()) * 1e6  # MHz a Hz
@@ -234,77 +546,16 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                                                antenna_type,
                                                antenna_pol,
                                                earth_radius_factor)
+            calculator.diagnostics = diagnostics
+            laps.stop()
             
             calculator.calculate_calc_los(height_tx, height_rx)
             LOS = calculator.calculate_get_los()
             
-            if self.ui.scatter_checkbox.isEnabled() == False:
-                self.ui.scatter_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
-                self.ui.fs_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
-                self.ui.databox_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
-                self.ui.pushExp1.setStyleSheet("color: rgb(238, 238, 238);")
-                self.ui.pushExp2.setStyleSheet("color: rgb(238, 238, 238);")
-                self.ui.toolbar_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
-                self.ui.scatter_checkbox.setEnabled(True)
-                self.ui.fs_checkbox.setEnabled(True)
-                self.ui.databox_checkbox.setEnabled(True)
-                self.ui.pushExp1.setEnabled(True)
-                self.ui.pushExp2.setEnabled(True)
-                self.ui.toolbar_checkbox.setEnabled(True)
-
-            
-            #############################
-            
-            # punto a punto
-            # E_total, P_r = calculator.calculate_point_to_point(height_tx, height_rx, distance_end)
-
-            # punto a punto en la GUI
-            '''
-            self.received_power_label.setText(
-                f'Potencia recibida (W): {P_r:.2e}')
-            self.electric_field_label.setText(
-                f'Campo eléctrico (V/m): {E_total:.2e}')
-            '''
-            #############################
-            
-            #############################
-            
-            # variación con la distancia
-            distances, E_totals, P_rs, E_fss, P_r_fss, Gammas, F_is = calculator.calculate_variation_with_distance(height_tx, height_rx, distance_start, distance_end, distance_step)
-            
-            # V/m a dBuV/cm
-            E_totals = [20 * np.log10(e_tot * 1e6 / 100e0) for e_tot in E_totals]
-            E_fss = [20 * np.log10(e_fs * 1e6 / 100e0) for e_fs in E_fss]
-
-            # W a dBm 
-            P_rs = [10 * np.log10(p * 1e3) for p in P_rs]
-            P_r_fss = [10 * np.log10(p_fs * 1e3) for p_fs in P_r_fss]
-
-            # gráfico de potencia recibida vs distancia
-            self.figure1.clear()
-            ax1 = self.figure1.add_subplot(111)
-            ax1.plot(distances / 1000, P_rs, label='total', color='b')  # Convertir de metros a km
-            ax1.plot(distances / 1000, P_r_fss, label='fs', color='g', linestyle='--')  # Convertir de metros a km
-            mplcursors.cursor() 
-            ax1.set_title('Potencia recibida vs Distancia')
-            ax1.set_xlabel('Distancia (km)')
-            ax1.set_ylabel('Potencia recibida (dBm)')
-            
-            ax1.set_ylim(bottom=min(np.min(P_rs), np.min(P_r_fss)) - (max(np.max(P_rs), np.max(P_r_fss)) - min(np.min(P_rs), np.min(P_r_fss))) * PLOT_Y_MARGIN_FACTOR, 
-                         top=max(np.max(P_rs), np.max(P_r_fss)) + (max(np.max(P_rs), np.max(P_r_fss)) - min(np.min(P_rs), np.min(P_r_fss))) * PLOT_Y_MARGIN_FACTOR)
-            
-            # if self.ui.scatter_checkbox.isChecked():
-            self.scatter_pr = ax1.scatter(distances / 1000, P_rs, color='b', marker='x', alpha=0.5)
-            self.scatter_prfs = ax1.scatter(distances / 1000, P_r_fss, color='g', marker='x', alpha=0.5)
-                
-            if distance_end >= LOS:
-                ax1.axvline(x=LOS / 1000, color='r', linestyle='dashdot', label='radhor')
+            # qué antena variar
+            vary_tx = self.ui.height_vary_input.currentText() == 'Tx'
             
-            ax1.set_xlim(left=(distance_start / 1000) - (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR, right=(distance_end / 1000) + (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR)
-            ax1.legend(fontsize=8)
-                     
-            ax1.grid(True, which='both', linestyle='--')
-            self.metadata_str = '\n'.join((
+            metadata_str = '\n'.join((
                 f'f: {freq / 1e6:.2f} MHz',
                 f'ht: {height_tx:.1f} m',
                 f'hr: {height_rx:.1f} m',
@@ -318,203 +569,361 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 f'Rad hor: {LOS / 1000:.1f} km'
             ))
 
-            props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
-            self.metadata_text_ax1 = ax1.text(0.96, 0.96, self.metadata_str, transform=ax1.transAxes, fontsize=8,
-                     verticalalignment='top', horizontalalignment='right', bbox=props)
-            
-            cursor1 = Cursor(ax1)
-            self.canvas1.mpl_connect('motion_notify_event', cursor1.on_mouse_move)
-            
-            self.canvas1.draw()
-
-            # gráfico de campo eléctrico vs distancia
-            self.figure2.clear()
-            ax2 = self.figure2.add_subplot(111)
-            ax2.plot(distances / 1000, E_totals, label='total', color='b')  # Convertir de metros a km
-            ax2.plot(distances / 1000, E_fss, label='fs', color='g', linestyle='--')  # Convertir de metros a km
-            mplcursors.cursor() 
-            ax2.set_title('Campo eléctrico vs Distancia')
-            ax2.set_xlabel('Distancia (km)')
-            ax2.set_ylabel('Campo eléctrico (dBuV/cm)')
-            
-            ax2.set_ylim(bottom=min(np.min(E_totals), np.min(E_fss)) - (max(np.max(E_totals), np.max(E_fss)) - min(np.min(E_totals), np.min(E_fss))) * PLOT_Y_MARGIN_FACTOR, 
-                         top=max(np.max(E_totals), np.max(E_fss)) + (max(np.max(E_totals), np.max(E_fss)) - min(np.min(E_totals), np.min(E_fss))) * PLOT_Y_MARGIN_FACTOR)
-
-            # if self.ui.scatter_checkbox.isChecked():
-            self.scatter_er = ax2.scatter(distances / 1000, E_totals, color='b', marker='x', alpha=0.5)
-            self.scatter_erfs = ax2.scatter(distances / 1000, E_fss, color='g', marker='x', alpha=0.5)
-            
-            ax2.grid(True, which='both', linestyle='--')
-            
-            if distance_end >= LOS:
-                ax2.axvline(x=LOS / 1000, color='r', linestyle='dashdot', label='radhor')
-                
-            ax2.set_xlim(left=(distance_start / 1000) - (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR, right=(distance_end / 1000) + (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR)
-
-            ax2.legend(fontsize=8)
+            # los mismos parámetros, en unidades SI, para los resultados binarios
+            metadata = dict(freq=freq, tx_power=tx_power, conductivity=conductivity, permitivity=permitivity,
+                            roughness=roughness, antenna_type=antenna_type, antenna_pol=antenna_pol,
+                            earth_radius_factor=earth_radius_factor, height_tx=height_tx, height_rx=height_rx,
+                            radio_horizon=float(LOS))
 
-            self.metadata_text_ax2 = ax2.text(0.96, 0.96, self.metadata_str, transform=ax2.transAxes, fontsize=8,
-                                              verticalalignment='top', horizontalalignment='right', bbox=props)
-            
-            cursor2 = Cursor(ax2)
-            self.canvas2.mpl_connect('motion_notify_event', cursor2.on_mouse_move)
-            
-            self.canvas2.draw()
-            
-            # tabla de variación con la distancia
-            self.table1.setRowCount(len(distances))
-            self.table1.setColumnCount(7)
-            self.table1.setHorizontalHeaderLabels(['d (km)', 'Pr (dBm)', 'Er (dBuV/cm)', 'Pr FS (dBm)', 'Er FS (dBuV/cm)', '|Gamma|', '|F_i|'])
-            for i in range(len(distances)):
-                self.table1.setItem(i, 0, QTableWidgetItem(f'{distances[i] / 1000:.2e}'))
-                self.table1.setItem(i, 1, QTableWidgetItem(f'{P_rs[i]:.2e}'))
-                self.table1.setItem(i, 2, QTableWidgetItem(f'{E_totals[i]:.2e}'))
-                self.table1.setItem(i, 3, QTableWidgetItem(f'{P_r_fss[i]:.2e}'))
-                self.table1.setItem(i, 4, QTableWidgetItem(f'{E_fss[i]:.2e}'))
-                self.table1.setItem(i, 5, QTableWidgetItem(f'{Gammas[i]:.2e}'))
-                self.table1.setItem(i, 6, QTableWidgetItem(f'{F_is[i]:.2e}'))
-            self.table1.resizeColumnsToContents()
-            self.table1.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-            
-            #############################
-            
-            #############################
-            
-            # qué antena variar
-            vary_tx = self.ui.height_vary_input.currentText() == 'Tx'
-
-            # variación con la altura de la antena
-            if vary_tx:
-                heights, E_totals_height, P_rs_height, Gammas_height, F_is_height, fresnel_zones = calculator.calculate_variation_with_height(1, 2 * height_tx, height_step, height_rx, vary_tx=True)
-                fixed_height = height_rx
-                fixed_label = 'hr'
-            else:
-                heights, E_totals_height, P_rs_height, Gammas_height, F_is_height, fresnel_zones = calculator.calculate_variation_with_height(1, 2 * height_rx, height_step, height_tx, vary_tx=False)
-                fixed_height = height_tx
-                fixed_label = 'ht'
-            
-            # V/m a dBuV/cm 
-            E_totals_height = [20 * np.log10(e_tot * 1e6 / 100e0) for e_tot in E_totals_height]  
-            
-            # W a dBm  
-            P_rs_height = [10 * np.log10(p * 1e3) for p in P_rs_height]
-            
-            # gráfico de potencia recibida vs altura de la antena
-            self.figure3.clear()
-            ax3 = self.figure3.add_subplot(111)
-            ax3.plot(heights, P_rs_height, color='blue', label='total')
-            mplcursors.cursor() 
-            ax3.axvline(x=fixed_height, color='green', linestyle='--', label=f'{fixed_label}')
-            ax3.set_title(f'Potencia recibida vs Altura de la antena {self.ui.height_vary_input.currentText()}')
-            ax3.set_xlabel(f'Altura de la antena {self.ui.height_vary_input.currentText()} (m)')
-            ax3.set_ylabel('Potencia recibida (dBm)')
-            ax3.set_ylim(bottom=np.min(P_rs_height) - (np.max(P_rs_height) - np.min(P_rs_height))*PLOT_Y_MARGIN_FACTOR, top=np.max(P_rs_height) + (np.max(P_rs_height) - np.min(P_rs_height))*PLOT_Y_MARGIN_FACTOR)
-            self.scatter_pr_h = ax3.scatter(heights, P_rs_height, color='blue', marker='x', alpha=0.5)
-            ax3.legend(loc='upper left', fontsize=8)
-            ax3.grid(True, which='both', linestyle='--')
-            
-            # for i, txt in enumerate(fresnel_zones):
-            #     ax3.annotate(f'{int(txt)}', (heights[i], P_rs_height[i]), textcoords="offset points", xytext=(0,10), ha='center')
-                
-            ax3_2 = ax3.twinx()
-            ax3_2.scatter(heights, fresnel_zones, color='r', label='Zona de Fresnel', alpha=0.33, marker='.')
-            ax3_2.yaxis.get_major_locator().set_params(integer=True)
-            ax3_2.set_ylim(bottom=-0.5, top=max(fresnel_zones) + 1)
-            ax3_2.set_ylabel('Zona de Fresnel despejada')
-            ax3_2.legend(loc='lower right', fontsize=8)
-            ax3_2.grid(True, axis='y', linestyle='dotted', alpha=0.75)
-            
-            ax3.set_xlim(left=(heights[0]) - (heights[-1] - heights[0])*PLOT_X_MARGIN_FACTOR, right=(heights[-1]) + (heights[-1] - heights[0])*PLOT_X_MARGIN_FACTOR)
-            
-            self.metadata_str += f'\nd: {distances[-1] / 1000:.1F} km'
-            self.metadata_text_ax3 = ax3.text(0.98, 0.96, self.metadata_str, transform=ax3.transAxes, fontsize=8,
-                     verticalalignment='top', horizontalalignment='right', bbox=props)
-            
-            cursor3 = Cursor(ax3)
-            self.canvas3.mpl_connect('motion_notify_event', cursor3.on_mouse_move)
-            
-            self.canvas3.draw()
-
-            # gráfico de campo eléctrico vs altura de la antena
-            self.figure4.clear()
-            ax4 = self.figure4.add_subplot(111)
-            ax4.plot(heights, E_totals_height, color='blue', label='total')
-            mplcursors.cursor() 
-            ax4.axvline(x=fixed_height, color='green', linestyle='--', label=f'{fixed_label}')
-            ax4.set_title(f'Campo eléctrico vs Altura de la antena {self.ui.height_vary_input.currentText()}')
-            ax4.set_xlabel(f'Altura de la antena {self.ui.height_vary_input.currentText()} (m)')
-            ax4.set_ylabel('Campo eléctrico (dBuV/cm)')
-            ax4.set_ylim(bottom=np.min(E_totals_height) - (np.max(E_totals_height) - np.min(E_totals_height))*PLOT_Y_MARGIN_FACTOR, top=np.max(E_totals_height) + (np.max(E_totals_height) - np.min(E_totals_height))*PLOT_Y_MARGIN_FACTOR)
-            self.scatter_er_h = ax4.scatter(heights, E_totals_height, color='blue', marker='x')
-            
-            ax4.legend(loc='upper left', fontsize=8)
-            ax4.grid(True, which='both', linestyle='--')
-            
-            ax4_2 = ax4.twinx()
-            ax4_2.scatter(heights, fresnel_zones, color='r', label='Zona de Fresnel', alpha=0.33, marker='.')
-            ax4_2.yaxis.get_major_locator().set_params(integer=True)
-            ax4_2.set_ylim(bottom=-0.5, top=max(fresnel_zones) + 1)
-            ax4_2.set_ylabel('Zona de Fresnel despejada')
-            ax4_2.legend(loc='lower right', fontsize=8)
-            ax4_2.grid(True, axis='y', linestyle='dotted', alpha=0.75)
-            
-            ax4.set_xlim(left=(heights[0]) - (heights[-1] - heights[0])*PLOT_X_MARGIN_FACTOR, right=(heights[-1]) + (heights[-1] - heights[0])*PLOT_X_MARGIN_FACTOR)
-            
-            self.metadata_text_ax4 = ax4.text(0.98, 0.96, self.metadata_str, transform=ax4.transAxes, fontsize=8,
-                     verticalalignment='top', horizontalalignment='right', bbox=props)           
-            
-            cursor4 = Cursor(ax4)
-            self.canvas4.mpl_connect('motion_notify_event', cursor4.on_mouse_move)
-            
-            self.canvas4.draw()
-            
-            # tabla de variación con la altura
-            self.table2.setRowCount(len(heights))
-            self.table2.setColumnCount(5)
-            self.table2.setHorizontalHeaderLabels(['Altura (m)', 'Pr (dBm)', 'Er (dBuV/cm)', '|Gamma|', '|F_i|'])
-            for i in range(len(heights)):
-                self.table2.setItem(i, 0, QTableWidgetItem(f'{heights[i]:.2e}'))
-                self.table2.setItem(i, 1, QTableWidgetItem(f'{P_rs_height[i]:.2e}'))
-                self.table2.setItem(i, 2, QTableWidgetItem(f'{E_totals_height[i]:.2e}'))
-                self.table2.setItem(i, 3, QTableWidgetItem(f'{Gammas_height[i]:.2e}'))
-                self.table2.setItem(i, 4, QTableWidgetItem(f'{F_is_height[i]:.2e}'))
-            self.table2.resizeColumnsToContents()
-            self.table2.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-            
-            self.ui.scatter_checkbox.setChecked(True)
-            self.ui.fs_checkbox.setChecked(True)
-            self.scatter_pr.set_visible(True)
-            self.scatter_er.set_visible(True)
-            self.scatter_prfs.set_visible(True)
-            self.scatter_erfs.set_visible(True)
+            inputs = dict(height_tx=height_tx, height_rx=height_rx,
+                          distance_start=distance_start, distance_end=distance_end, distance_step=distance_step,
+                          height_step=height_step, vary_tx=vary_tx, vary_label=self.ui.height_vary_input.currentText(),
+                          LOS=LOS, metadata_str=metadata_str, metadata=metadata,
+                          diagnostics=diagnostics, run_start=run_start)
             
         except ValueError as e:
             error_message = f"Error: {str(e)}\n\nPor favor, ingrese valores numéricos válidos en todos los campos."
             msg_box = QMessageBox(QMessageBox.Icon.Critical, "Error de entrada", error_message, QMessageBox.StandardButton.Ok, self)
             msg_box.setStyleSheet("QLabel { color : white; }")
             msg_box.exec()
+            return
+        
+        # una corrida nueva reemplaza a la que esté en curso
+        self.cancel_calculation()
+        
+        worker = CalculationWorker(calculator, inputs, self.result_cache)
+        worker.progress.connect(self.progress_bar.setValue)
+        worker.results.connect(self.show_results)
+        worker.failed.connect(self.show_calculation_error)
+        worker.finished.connect(lambda: self.calculation_finished(worker))
+        self.worker = worker
+        self.workers.append(worker)
+        
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+        worker.start()
+
+    def cancel_calculation(self):
+        if self.worker is not None:
+            self.worker.progress.disconnect()
+            self.worker.results.disconnect()
+            self.worker.failed.disconnect()
+            self.worker.cancel()
+            self.worker = None
+        
+        self.progress_bar.hide()
+        self.cancel_button.setEnabled(False)
+
+    def calculation_finished(self, worker):
+        self.workers.remove(worker)
+        worker.deleteLater()
+        
+        if worker is self.worker:
+            self.worker = None
+            self.progress_bar.hide()
+            self.cancel_button.setEnabled(False)
+
+    def closeEvent(self, event):
+        self.cancel_calculation()
+        for worker in self.workers:
+            worker.wait()
+        super().closeEvent(event)
+
+    def show_calculation_error(self, message):
+        msg_box = QMessageBox(QMessageBox.Icon.Critical, "Error de cálculo", f"Error: {message}", QMessageBox.StandardButton.Ok, self)
+        msg_box.setStyleSheet("QLabel { color : white; }")
+        msg_box.exec()
+
+    def setup_plots(self):
+        props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
+        
+        # gráfico de potencia recibida vs distancia
+        self.ax1 = self.figure1.add_subplot(111)
+        self.line_pr, = self.ax1.plot([], [], label='total', color='b')
+        self.line_prfs, = self.ax1.plot([], [], label='fs', color='g', linestyle='--')
+        self.scatter_pr = self.ax1.scatter([], [], color='b', marker='x', alpha=0.5)
+        self.scatter_prfs = self.ax1.scatter([], [], color='g', marker='x', alpha=0.5)
+        self.radhor_line1 = self.ax1.axvline(x=0, color='r', linestyle='dashdot', label='radhor')
+        self.ax1.set_title('Potencia recibida vs Distancia')
+        self.ax1.set_xlabel('Distancia (km)')
+        self.ax1.set_ylabel('Potencia recibida (dBm)')
+        self.ax1.grid(True, which='both', linestyle='--')
+        self.metadata_text_ax1 = self.ax1.text(0.96, 0.96, '', transform=self.ax1.transAxes, fontsize=8,
+                                               verticalalignment='top', horizontalalignment='right', bbox=props)
+        mplcursors.cursor([self.line_pr, self.line_prfs])
+        
+        # gráfico de campo eléctrico vs distancia
+        self.ax2 = self.figure2.add_subplot(111)
+        self.line_er, = self.ax2.plot([], [], label='total', color='b')
+        self.line_erfs, = self.ax2.plot([], [], label='fs', color='g', linestyle='--')
+        self.scatter_er = self.ax2.scatter([], [], color='b', marker='x', alpha=0.5)
+        self.scatter_erfs = self.ax2.scatter([], [], color='g', marker='x', alpha=0.5)
+        self.radhor_line2 = self.ax2.axvline(x=0, color='r', linestyle='dashdot', label='radhor')
+        self.ax2.set_title('Campo eléctrico vs Distancia')
+        self.ax2.set_xlabel('Distancia (km)')
+        self.ax2.set_ylabel('Campo eléctrico (dBuV/cm)')
+        self.ax2.grid(True, which='both', linestyle='--')
+        self.metadata_text_ax2 = self.ax2.text(0.96, 0.96, '', transform=self.ax2.transAxes, fontsize=8,
+                                               verticalalignment='top', horizontalalignment='right', bbox=props)
+        mplcursors.cursor([self.line_er, self.line_erfs])
+        
+        # gráficos vs altura de la antena, con la zona de Fresnel despejada en un eje gemelo
+        self.ax3 = self.figure3.add_subplot(111)
+        self.line_pr_h, = self.ax3.plot([], [], color='blue', label='total')
+        self.fixed_line3 = self.ax3.axvline(x=0, color='green', linestyle='--')
+        self.scatter_pr_h = self.ax3.scatter([], [], color='blue', marker='x', alpha=0.5)
+        self.ax3.set_ylabel('Potencia recibida (dBm)')
+        self.ax3.grid(True, which='both', linestyle='--')
+        
+        self.ax4 = self.figure4.add_subplot(111)
+        self.line_er_h, = self.ax4.plot([], [], color='blue', label='total')
+        self.fixed_line4 = self.ax4.axvline(x=0, color='green', linestyle='--')
+        self.scatter_er_h = self.ax4.scatter([], [], color='blue', marker='x')
+        self.ax4.set_ylabel('Campo eléctrico (dBuV/cm)')
+        self.ax4.grid(True, which='both', linestyle='--')
+        
+        self.fresnel_axes = []
+        self.fresnel_scatters = []
+        for ax in (self.ax3, self.ax4):
+            ax_2 = ax.twinx()
+            scatter = ax_2.scatter([], [], color='r', label='Zona de Fresnel', alpha=0.33, marker='.')
+            ax_2.yaxis.get_major_locator().set_params(integer=True)
+            ax_2.set_ylabel('Zona de Fresnel despejada')
+            ax_2.legend(loc='lower right', fontsize=8)
+            ax_2.grid(True, axis='y', linestyle='dotted', alpha=0.75)
+            self.fresnel_axes.append(ax_2)
+            self.fresnel_scatters.append(scatter)
+        
+        self.metadata_text_ax3 = self.ax3.text(0.98, 0.96, '', transform=self.ax3.transAxes, fontsize=8,
+                                               verticalalignment='top', horizontalalignment='right', bbox=props)
+        self.metadata_text_ax4 = self.ax4.text(0.98, 0.96, '', transform=self.ax4.transAxes, fontsize=8,
+                                               verticalalignment='top', horizontalalignment='right', bbox=props)
+        mplcursors.cursor([self.line_pr_h])
+        mplcursors.cursor([self.line_er_h])
+        
+        self.cursors = [Cursor(ax) for ax in (self.ax1, self.ax2, self.ax3, self.ax4)]
+        # los ejes gemelos comparten x, así que las zonas de Fresnel se deciman con el eje principal
+        self.lod1, self.lod2, self.lod3, self.lod4 = (LevelOfDetail(ax) for ax in (self.ax1, self.ax2, self.ax3, self.ax4))
+        
+        # vacíos hasta el primer cálculo
+        for ax in (self.ax1, self.ax2, self.ax3, self.ax4, *self.fresnel_axes):
+            ax.set_visible(False)
+
+    def show_results(self, inputs, distance_result, height_result):
+        height_tx, height_rx = inputs['height_tx'], inputs['height_rx']
+        distance_start, distance_end = inputs['distance_start'], inputs['distance_end']
+        vary_tx, vary_label, LOS = inputs['vary_tx'], inputs['vary_label'], inputs['LOS']
+        self.metadata_str = inputs['metadata_str']
+        
+        self.results[self.table1] = (distance_result, dict(inputs['metadata'], distance_start=distance_start,
+                                                           distance_end=distance_end, distance_step=inputs['distance_step']))
+        self.results[self.table2] = (height_result, dict(inputs['metadata'], distance=float(distance_result.distances[-1]),
+                                                         vary_tx=vary_tx, height_step=inputs['height_step']))
+        
+        # cada corrida trae su propio registro, así una corrida cancelada no mezcla sus tiempos
+        self.diagnostics = inputs['diagnostics']
+        laps = self.diagnostics.laps()
+        
+        if self.ui.scatter_checkbox.isEnabled() == False:
+            self.ui.scatter_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
+            self.ui.fs_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
+            self.ui.databox_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
+            self.ui.pushExp1.setStyleSheet("color: rgb(238, 238, 238);")
+            self.ui.pushExp2.setStyleSheet("color: rgb(238, 238, 238);")
+            self.ui.toolbar_checkbox.setStyleSheet("color: rgb(238, 238, 238);")
+            self.ui.scatter_checkbox.setEnabled(True)
+            self.ui.fs_checkbox.setEnabled(True)
+            self.ui.databox_checkbox.setEnabled(True)
+            self.ui.pushExp1.setEnabled(True)
+            self.ui.pushExp2.setEnabled(True)
+            self.ui.toolbar_checkbox.setEnabled(True)
+
+        for ax in (self.ax1, self.ax2, self.ax3, self.ax4, *self.fresnel_axes):
+            ax.set_visible(True)
+        
+        #############################
+        
+        # variación con la distancia
+        laps.start('db_conversion')
+        distances = distance_result.distances
+        Gammas = distance_result.Gamma
+        F_is = distance_result.F_i
+        
+        # V/m a dBuV/cm
+        E_totals = 20 * np.log10(distance_result.E_total * 1e6 / 100e0)
+        E_fss = 20 * np.log10(distance_result.E_fs * 1e6 / 100e0)
+
+        # W a dBm 
+        P_rs = 10 * np.log10(distance_result.P_r * 1e3)
+        P_r_fss = 10 * np.log10(distance_result.P_r_fs * 1e3)
+        
+        distances_km = distances / 1000  # Convertir de metros a km
+
+        # gráfico de potencia recibida vs distancia
+        laps.start('plot_power_distance')
+        ax1 = self.ax1
+        self.lod1.set_data(self.line_pr, distances_km, P_rs)
+        self.lod1.set_data(self.line_prfs, distances_km, P_r_fss)
+        self.lod1.set_data(self.scatter_pr, distances_km, P_rs)
+        self.lod1.set_data(self.scatter_prfs, distances_km, P_r_fss)
+        
+        ax1.set_ylim(bottom=min(np.min(P_rs), np.min(P_r_fss)) - (max(np.max(P_rs), np.max(P_r_fss)) - min(np.min(P_rs), np.min(P_r_fss))) * PLOT_Y_MARGIN_FACTOR, 
+                     top=max(np.max(P_rs), np.max(P_r_fss)) + (max(np.max(P_rs), np.max(P_r_fss)) - min(np.min(P_rs), np.min(P_r_fss))) * PLOT_Y_MARGIN_FACTOR)
+        
+        self.radhor_line1.set_xdata([LOS / 1000])
+        self.radhor_line1.set_visible(distance_end >= LOS)
+        
+        ax1.set_xlim(left=(distance_start / 1000) - (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR, right=(distance_end / 1000) + (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR)
+        ax1.legend(handles=[self.line_pr, self.line_prfs] + ([self.radhor_line1] if distance_end >= LOS else []), fontsize=8)
+        
+        self.metadata_text_ax1.set_text(self.metadata_str)
+        self.toolbar1.update()
+        self.canvas1.draw_idle()
+
+        # gráfico de campo eléctrico vs distancia
+        laps.start('plot_field_distance')
+        ax2 = self.ax2
+        self.lod2.set_data(self.line_er, distances_km, E_totals)
+        self.lod2.set_data(self.line_erfs, distances_km, E_fss)
+        self.lod2.set_data(self.scatter_er, distances_km, E_totals)
+        self.lod2.set_data(self.scatter_erfs, distances_km, E_fss)
+        
+        ax2.set_ylim(bottom=min(np.min(E_totals), np.min(E_fss)) - (max(np.max(E_totals), np.max(E_fss)) - min(np.min(E_totals), np.min(E_fss))) * PLOT_Y_MARGIN_FACTOR, 
+                     top=max(np.max(E_totals), np.max(E_fss)) + (max(np.max(E_totals), np.max(E_fss)) - min(np.min(E_totals), np.min(E_fss))) * PLOT_Y_MARGIN_FACTOR)
+        
+        self.radhor_line2.set_xdata([LOS / 1000])
+        self.radhor_line2.set_visible(distance_end >= LOS)
+            
+        ax2.set_xlim(left=(distance_start / 1000) - (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR, right=(distance_end / 1000) + (distance_end/1000 - distance_start/1000)*PLOT_X_MARGIN_FACTOR)
+        ax2.legend(handles=[self.line_er, self.line_erfs] + ([self.radhor_line2] if distance_end >= LOS else []), fontsize=8)
+
+        self.metadata_text_ax2.set_text(self.metadata_str)
+        self.toolbar2.update()
+        self.canvas2.draw_idle()
+        
+        # tabla de variación con la distancia
+        laps.start('table_distance')
+        self.table1.model().set_columns(['d (km)', 'Pr (dBm)', 'Er (dBuV/cm)', 'Pr FS (dBm)', 'Er FS (dBuV/cm)', '|Gamma|', '|F_i|'],
+                                        [distances_km, P_rs, E_totals, P_r_fss, E_fss, Gammas, F_is])
+        self.table1.resizeColumnsToContents()
+        self.table1.setSortingEnabled(True)
+        
+        #############################
+        
+        #############################
+        
+        if vary_tx:
+            fixed_height = height_rx
+            fixed_label = 'hr'
+        else:
+            fixed_height = height_tx
+            fixed_label = 'ht'
+        
+        # variación con la altura de la antena
+        laps.start('db_conversion')
+        heights = height_result.heights
+        Gammas_height = height_result.Gamma
+        F_is_height = height_result.F_i
+        fresnel_zones = height_result.fresnel_zones
+        
+        # V/m a dBuV/cm 
+        E_totals_height = 20 * np.log10(height_result.E_total * 1e6 / 100e0)
+        
+        # W a dBm  
+        P_rs_height = 10 * np.log10(height_result.P_r * 1e3)
+        
+        self.metadata_str += f'\nd: {distances[-1] / 1000:.1F} km'
+        
+        # gráficos de potencia recibida y campo eléctrico vs altura de la antena
+        plots = ((self.ax3, self.lod3, self.line_pr_h, self.scatter_pr_h, self.fixed_line3, self.metadata_text_ax3, P_rs_height, 'Potencia recibida'),
+                 (self.ax4, self.lod4, self.line_er_h, self.scatter_er_h, self.fixed_line4, self.metadata_text_ax4, E_totals_height, 'Campo eléctrico'))
+        for (ax, lod, line, scatter, fixed_line, metadata_text, values, name), ax_2, fresnel_scatter in zip(plots, self.fresnel_axes, self.fresnel_scatters):
+            laps.start('plot_power_height' if ax is self.ax3 else 'plot_field_height')
+            lod.set_data(line, heights, values)
+            lod.set_data(scatter, heights, values)
+            fixed_line.set_xdata([fixed_height])
+            fixed_line.set_label(f'{fixed_label}')
+            ax.set_title(f'{name} vs Altura de la antena {vary_label}')
+            ax.set_xlabel(f'Altura de la antena {vary_label} (m)')
+            ax.set_ylim(bottom=np.min(values) - (np.max(values) - np.min(values))*PLOT_Y_MARGIN_FACTOR, top=np.max(values) + (np.max(values) - np.min(values))*PLOT_Y_MARGIN_FACTOR)
+            ax.legend(handles=[line, fixed_line], loc='upper left', fontsize=8)
+            
+            lod.set_data(fresnel_scatter, heights, fresnel_zones)
+            ax_2.set_ylim(bottom=-0.5, top=max(fresnel_zones) + 1)
+            
+            ax.set_xlim(left=(heights[0]) - (heights[-1] - heights[0])*PLOT_X_MARGIN_FACTOR, right=(heights[-1]) + (heights[-1] - heights[0])*PLOT_X_MARGIN_FACTOR)
+            
+            metadata_text.set_text(self.metadata_str)
+        
+        self.toolbar3.update()
+        self.toolbar4.update()
+        self.canvas3.draw_idle()
+        self.canvas4.draw_idle()
+        
+        # tabla de variación con la altura
+        laps.start('table_height')
+        self.table2.model().set_columns(['Altura (m)', 'Pr (dBm)', 'Er (dBuV/cm)', '|Gamma|', '|F_i|'],
+                                        [heights, P_rs_height, E_totals_height, Gammas_height, F_is_height])
+        self.table2.resizeColumnsToContents()
+        self.table2.setSortingEnabled(True)
+        
+        self.ui.scatter_checkbox.setChecked(True)
+        self.ui.fs_checkbox.setChecked(True)
+        self.scatter_pr.set_visible(True)
+        self.scatter_er.set_visible(True)
+        self.scatter_prfs.set_visible(True)
+        self.scatter_erfs.set_visible(True)
+        
+        laps.stop()
+        if self.diagnostics.enabled:
+            # hasta acá, sin el render de los canvas, que Qt hace después (draw_idle) y se registra como 'render'
+            self.diagnostics.add_span('run', time.perf_counter() - inputs['run_start'])
+        # después de los draw_idle pendientes, para incluir su render
+        QTimer.singleShot(0, self.update_diagnostics)
+
+    def time_canvas_draws(self, canvas):
+        draw = canvas.draw
+        def timed_draw(*args, **kwargs):
+            with self.diagnostics.span('render'):
+                return draw(*args, **kwargs)
+        canvas.draw = timed_draw
+
+    def toggle_diagnostics(self):
+        # el panel se despliega solo mientras se registra
+        self.diagnostics_panel.setVisible(self.diagnostics_checkbox.isChecked())
+        self.update_diagnostics()
+
+    def update_diagnostics(self):
+        if self.diagnostics.enabled:
+            stats = self.result_cache.stats()
+            self.diagnostics_text.setPlainText(self.diagnostics.format() + '\n\n' +
+                                               f"caché de resultados: {stats['hits']} aciertos, {stats['misses']} fallos, "
+                                               f"{stats['entries']} entradas, {stats['bytes'] / 2**20:.1f} MB" +
+                                               (f"; en disco: {stats['disk']['hits']} aciertos, {stats['disk']['entries']} entradas, "
+                                                f"{stats['disk']['bytes'] / 2**20:.1f} MB" if 'disk' in stats else ''))
+        else:
+            self.diagnostics_text.setPlainText("Sin datos: habilitar Diagnóstico y volver a calcular.")
+
+    def export_diagnostics(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Guardar diagnóstico como JSON", 'diagnostico.json', "JSON Files (*.json);;All Files (*)")
+        if file_path:
+            self.diagnostics.dump_json(file_path)
 
     def export_table_to_csv(self, table, default_filename):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Guardar tabla como CSV", default_filename, "CSV Files (*.csv);;All Files (*)")
+        file_path, selected_filter = QFileDialog.getSaveFileName(self, "Guardar tabla como CSV", default_filename,
+                                                                 "CSV Files (*.csv);;Resultado binario (*.npy);;All Files (*)")
         if file_path:
-            with open(file_path, 'w', newline='') as file:
-                writer = csv.writer(file)
-                
-                # metadata
-                writer.writerow(['_metadata_start'])
-                writer.writerow(['Fecha y hora', datetime.now(timezone.utc)])
-                for line in self.metadata_str.split('\n'):
-                    writer.writerow([line])
-                writer.writerow(['_metadata_end'])
-                
-                # headers
-                headers = [table.horizontalHeaderItem(i).text() for i in range(table.columnCount())]
-                writer.writerow(headers)
-                
-                # data
-                for row in range(table.rowCount()):
-                    row_data = [table.item(row, col).text() if table.item(row, col) is not None else '' for col in range(table.columnCount())]
-                    writer.writerow(row_data)
+            if file_path.endswith('.npy') or selected_filter.startswith("Resultado binario"):
+                # resultado completo en SI, legible con export.load_result sin parsear texto
+                result, metadata = self.results[table]
+                save_result(file_path, result, metadata)
+                return
+            
+            # desde los arrays del modelo, no desde el texto formateado de la tabla, en el orden que se ve
+            model = table.model()
+            columns = [column[model.order] for column in model.columns]
+            write_csv(file_path, model.headers, columns, self.metadata_str.split('\n'), precision=self.precision_input.value())
               
     def scatter_checkbox_changed(self):
         if self.ui.scatter_checkbox.isChecked():
@@ -539,66 +948,34 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.scatter_pr_h.set_visible(False)
             self.scatter_er_h.set_visible(False)
         
-        self.canvas1.draw()
-        self.canvas2.draw()
-        self.canvas3.draw()
-        self.canvas4.draw()        
+        self.canvas1.draw_idle()
+        self.canvas2.draw_idle()
+        self.canvas3.draw_idle()
+        self.canvas4.draw_idle()        
                 
     def fs_checkbox_changed(self):
-        ax1 = self.canvas1.figure.gca()
-        ax2 = self.canvas2.figure.gca()
+        visible = self.ui.fs_checkbox.isChecked()
         
-        plot_pr = [line for line in ax1.get_lines() if line.get_label() == 'total']
-        plot_prfs = [line for line in ax1.get_lines() if line.get_label() == 'fs']
+        for ax, lod, line, line_fs, scatter_fs in ((self.ax1, self.lod1, self.line_pr, self.line_prfs, self.scatter_prfs),
+                                                   (self.ax2, self.lod2, self.line_er, self.line_erfs, self.scatter_erfs)):
+            line_fs.set_visible(visible)
+            scatter_fs.set_visible(visible and self.ui.scatter_checkbox.isChecked())
+            
+            if ax.get_legend() is not None:
+                ax.get_legend().get_texts()[1].set_visible(visible)
+                ax.get_legend().get_lines()[1].set_visible(visible)
+            
+            if line not in lod.series:
+                continue
+            y = lod.get_data(line)[1]
+            if visible:
+                y = np.concatenate((y, lod.get_data(line_fs)[1]))
+            
+            ax.set_ylim(bottom=np.min(y) - (np.max(y) - np.min(y)) * PLOT_Y_MARGIN_FACTOR, 
+                        top=np.max(y) + (np.max(y) - np.min(y)) * PLOT_Y_MARGIN_FACTOR)
         
-        plot_er = [line for line in ax2.get_lines() if line.get_label() == 'total']
-        plot_erfs = [line for line in ax2.get_lines() if line.get_label() == 'fs']
-        
-        if self.ui.fs_checkbox.isChecked():
-            plot_prfs[0].set_visible(True)
-            ax1.get_legend().get_texts()[1].set_visible(True)
-            ax1.get_legend().get_lines()[1].set_visible(True)
-            
-            ax1.set_ylim(bottom=min(np.min(plot_pr[0].get_ydata()), np.min(plot_prfs[0].get_ydata())) - (max(np.max(plot_pr[0].get_ydata()), np.max(plot_prfs[0].get_ydata())) - min(np.min(plot_pr[0].get_ydata()), np.min(plot_prfs[0].get_ydata())))*PLOT_Y_MARGIN_FACTOR, 
-                             top=max(np.max(plot_pr[0].get_ydata()), np.max(plot_prfs[0].get_ydata())) + (max(np.max(plot_pr[0].get_ydata()), np.max(plot_prfs[0].get_ydata())) - min(np.min(plot_pr[0].get_ydata()), np.min(plot_prfs[0].get_ydata())))*PLOT_Y_MARGIN_FACTOR)
-            
-            plot_erfs[0].set_visible(True)
-            ax2.get_legend().get_texts()[1].set_visible(True)
-            ax2.get_legend().get_lines()[1].set_visible(True)
-            
-            ax2.set_ylim(bottom=min(np.min(plot_er[0].get_ydata()), np.min(plot_erfs[0].get_ydata())) - (max(np.max(plot_er[0].get_ydata()), np.max(plot_erfs[0].get_ydata())) - min(np.min(plot_er[0].get_ydata()), np.min(plot_erfs[0].get_ydata())))*PLOT_Y_MARGIN_FACTOR, 
-                             top=max(np.max(plot_er[0].get_ydata()), np.max(plot_erfs[0].get_ydata())) + (max(np.max(plot_er[0].get_ydata()), np.max(plot_erfs[0].get_ydata())) - min(np.min(plot_er[0].get_ydata()), np.min(plot_erfs[0].get_ydata())))*PLOT_Y_MARGIN_FACTOR)
-        
-            if self.ui.scatter_checkbox.isChecked():
-                self.scatter_prfs.set_visible(True)
-                self.scatter_erfs.set_visible(True)
-            else:
-                self.scatter_prfs.set_visible(False)
-                self.scatter_erfs.set_visible(False)
-            
-            self.canvas1.draw()
-            self.canvas2.draw()
-               
-        else:
-            plot_prfs[0].set_visible(False)
-            ax1.get_legend().get_texts()[1].set_visible(False)
-            ax1.get_legend().get_lines()[1].set_visible(False)
-            
-            ax1.set_ylim(bottom=np.min(plot_pr[0].get_ydata()) - (np.max(plot_pr[0].get_ydata()) - np.min(plot_pr[0].get_ydata())) * PLOT_Y_MARGIN_FACTOR, 
-                             top=np.max(plot_pr[0].get_ydata()) + (np.max(plot_pr[0].get_ydata()) - np.min(plot_pr[0].get_ydata())) * PLOT_Y_MARGIN_FACTOR)
-            
-            plot_erfs[0].set_visible(False)
-            ax2.get_legend().get_texts()[1].set_visible(False)
-            ax2.get_legend().get_lines()[1].set_visible(False)
-            
-            ax2.set_ylim(bottom=np.min(plot_er[0].get_ydata()) - (np.max(plot_er[0].get_ydata()) - np.min(plot_er[0].get_ydata())) * PLOT_Y_MARGIN_FACTOR, 
-                             top=np.max(plot_er[0].get_ydata()) + (np.max(plot_er[0].get_ydata()) - np.min(plot_er[0].get_ydata())) * PLOT_Y_MARGIN_FACTOR)
-            
-            self.scatter_prfs.set_visible(False)
-            self.scatter_erfs.set_visible(False)
-
-            self.canvas1.draw()
-            self.canvas2.draw()  
+        self.canvas1.draw_idle()
+        self.canvas2.draw_idle()
 
     def databox_checkbox_changed(self):
         if self.ui.databox_checkbox.isChecked():
@@ -612,7 +989,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.metadata_text_ax3.set_visible(False)
             self.metadata_text_ax4.set_visible(False)
             
-        self.canvas1.draw()
-        self.canvas2.draw()
-        self.canvas3.draw()
-        self.canvas4.draw()
\ No newline at end of file
+        self.canvas1.draw_idle()
+        self.canvas2.draw_idle()
+        self.canvas3.draw_idle()
+        self.canvas4.draw_idle()
\ No newline at end of file
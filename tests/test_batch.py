@@ -0,0 +1,32 @@
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch import OUTPUT_FIELDS, SCENARIO_FIELDS, run_batch
+
+LINK = {'freq': 100e6, 'tx_power': 10, 'conductivity': 0.005, 'permitivity': 15, 'roughness': 0,
+        'antenna_type': 0, 'antenna_pol': 0, 'earth_radius_factor': 4 / 3,
+        'height_tx': 30, 'height_rx': 10, 'distance': 5000}
+
+
+def test_resume_from_header_only_output(tmp_path):
+    scenarios = tmp_path / 'scenarios.csv'
+    with open(scenarios, 'w', newline='') as file:
+        writer = csv.DictWriter(file, SCENARIO_FIELDS)
+        writer.writeheader()
+        writer.writerows([LINK, LINK])
+
+    # lo que deja una primera corrida interrumpida antes de escribir resultados
+    output = tmp_path / 'results.csv'
+    with open(output, 'w', newline='') as file:
+        csv.writer(file).writerow(OUTPUT_FIELDS)
+
+    run_batch(str(scenarios), str(output), workers=1)
+
+    with open(output, newline='') as file:
+        rows = list(csv.reader(file))
+
+    assert rows[0] == list(OUTPUT_FIELDS)
+    assert [row[0] for row in rows[1:]] == ['0', '1']